@@ -0,0 +1,243 @@
+"""benchmark of each stage of thaig2p
+
+runs offline, corpora are built from the bundled dictionaries:
+- in-dictionary words : g2p_dict.csv / thai2phone.csv entries with phone
+- out-of-dictionary   : thai2phone.csv entries without phone (they go to tltk)
+                        some of them cannot be converted (tltk output breaks the syllable rules),
+                        so OOV words and sentences with them are tried once and drawn again if they fail
+- numbers and times   : random, generated with the seed
+- sentences           : mix of above with given OOV / number / time ratios
+
+usage
+    python benchmarks/bench_g2p.py -o bench.json
+    python benchmarks/bench_g2p.py --sentences 500 --oov-ratio 0.1 --workers 4 -o new.json --compare bench.json
+"""
+
+import os, sys, csv, json, time, random, argparse, platform, tracemalloc, resource, statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from thaig2p import main as thaig2p_main
+from thaig2p.main import (clean, word_tokenize, get_phone_word, get_phone_word_tltk, _get_phone_word_tltk,
+    get_phone_number, get_phone_time, decode, decode_many, g2p, g2p_batch, warmup)
+
+TRANSCRIPTIONS = ['haas', 'ipa', 'rtgs']
+
+##################################################
+### CORPORA
+##################################################
+
+def load_words():
+    # (in-dictionary words, out-of-dictionary words)
+    with open(os.path.join(ROOT, 'thaig2p', 'thai2phone.csv')) as f:
+        rows = list(csv.reader(f))
+    with open(os.path.join(ROOT, 'g2p_dict.csv')) as f:
+        common = [row['g'] for row in csv.DictReader(f)]
+    oov = sorted({k for k, v in rows if v == ''} - {k for k, v in rows if v != ''})
+    return common, oov
+
+def random_number(rng):
+    kind = rng.random()
+    if kind < 0.6:
+        return str(rng.randint(0, 10 ** rng.randint(1, 9)))
+    elif kind < 0.8:
+        return f'{rng.randint(0, 10 ** 6):,}'
+    return f'{rng.randint(0, 9999)}.{rng.randint(0, 99):02d}'
+
+def random_time(rng, suffix=True):
+    time = f'{rng.randint(0, 23)}{rng.choice(".:")}{rng.randint(0, 59):02d}'
+    return time + rng.choice(['', 'น.']) if suffix else time
+
+def convertible(func):
+    # whether func(item) runs without error, i.e. the current pipeline can convert the item
+    def check(item):
+        try:
+            func(item)
+        except Exception:
+            return False
+        return True
+    return check
+
+def g2p_all(sentence):
+    # g2p of all stages which use the sentence corpus
+    for tokenizer in ('pythainlp', 'lexicon'):
+        for transcription in TRANSCRIPTIONS:
+            g2p(sentence, transcription, tokenizer=tokenizer)
+
+def sample_oov(oov, k, rng, check):
+    # k distinct OOV words which pass check, drawn with rng (reproducible for the seed)
+    sampled, tried = [], set()
+    while len(sampled) < k and len(tried) < len(oov):
+        word = rng.choice(oov)
+        if word in tried:
+            continue
+        tried.add(word)
+        if check(word):
+            sampled.append(word)
+    return sampled
+
+def build_sentences(n, words, oov, oov_ratio, number_ratio, time_ratio, rng, length=(5, 20), check=None):
+    """synthetic sentences, each token is OOV / number / time / word with the given ratios
+    sentences with OOV words are drawn again while check(sentence) is False
+    """
+    sentences = []
+    while len(sentences) < n:
+        tokens = []
+        has_oov = False
+        for _ in range(rng.randint(*length)):
+            r = rng.random()
+            if r < oov_ratio:
+                tokens.append(rng.choice(oov))
+                has_oov = True
+            elif r < oov_ratio + number_ratio:
+                tokens.append(f' {random_number(rng)} ')
+            elif r < oov_ratio + number_ratio + time_ratio:
+                tokens.append(f' {random_time(rng)} ')
+            else:
+                tokens.append(rng.choice(words))
+        sentence = ''.join(tokens).strip()
+        if has_oov and check is not None and not check(sentence):
+            continue
+        sentences.append(sentence)
+    return sentences
+
+##################################################
+### MEASUREMENT
+##################################################
+
+def measure(func, items, memory_items=200):
+    """call func(item) for each item, returns latency percentiles, throughput and peak memory"""
+    times = []
+    perf_counter = time.perf_counter
+    for item in items:
+        start = perf_counter()
+        func(item)
+        times.append(perf_counter() - start)
+    # peak memory in a separate pass, tracemalloc slows down the calls
+    tracemalloc.start()
+    for item in items[:memory_items]:
+        func(item)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    total = sum(times)
+    quantiles = statistics.quantiles(times, n=100) if len(times) > 1 else times * 99
+    return {
+        'calls': len(times),
+        'total_s': total,
+        'per_sec': len(times) / total if total else None,
+        'mean_us': total / len(times) * 1e6,
+        'p50_us': quantiles[49] * 1e6,
+        'p90_us': quantiles[89] * 1e6,
+        'p99_us': quantiles[98] * 1e6,
+        'peak_kib': peak / 1024,
+    }
+
+def measure_batch(func, items):
+    """one call on all items, for batch APIs"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(items)
+    total = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'calls': len(items), 'total_s': total, 'per_sec': len(items) / total, 'peak_kib': peak / 1024}
+
+def clear_tltk_cache():
+    thaig2p_main._tltk_cache().clear()
+
+##################################################
+### BENCHMARKS
+##################################################
+
+def run(args):
+    rng = random.Random(args.seed)
+    words, oov = load_words()
+    print('checking OOV words', file=sys.stderr, flush=True)
+    sentences = build_sentences(args.sentences, words, oov, args.oov_ratio, args.number_ratio, args.time_ratio, rng,
+        check=convertible(g2p_all))
+    cleaned = [clean(s) for s in sentences]
+    tokens = [word_tokenize(s, keep_whitespace=False) for s in cleaned]
+    lookup_words = rng.sample(words, min(args.words, len(words)))
+    oov_words = sample_oov(oov, args.oov_words, rng, convertible(_get_phone_word_tltk))
+    numbers = [random_number(rng).replace(',', '') for _ in range(args.words)]
+    times = [random_time(rng, suffix=False) for _ in range(args.words)]
+    phones = [p for p in (get_phone_word(w) for w in lookup_words) if p]
+
+    results = {}
+    def stage(name, func, items):
+        print(f'{name:<28}', end='', file=sys.stderr, flush=True)
+        results[name] = func(items)
+        print(f"{results[name]['per_sec']:>12.1f} /s", file=sys.stderr, flush=True)
+
+    m = lambda f: (lambda items: measure(f, items))
+    stage('clean', m(clean), sentences)
+    stage('word_tokenize', m(lambda s: word_tokenize(s, keep_whitespace=False)), cleaned)
+    stage('lexicon_lookup', m(lambda ts: [get_phone_word(t) for t in ts]), tokens)
+    stage('get_phone_word_tltk', m(_get_phone_word_tltk), oov_words)
+    clear_tltk_cache()
+    get_phone_word_tltk(oov_words[0])
+    stage('get_phone_word_tltk_cached', m(get_phone_word_tltk), [oov_words[0]] * args.words)
+    stage('get_phone_number', m(get_phone_number), numbers)
+    stage('get_phone_time', m(get_phone_time), times)
+    for transcription in TRANSCRIPTIONS:
+        stage(f'decode_{transcription}', m(lambda p: decode(p, transcription)), phones)
+        stage(f'decode_many_{transcription}', lambda items: measure_batch(lambda ps: decode_many(ps, transcription), items), phones)
+    for transcription in TRANSCRIPTIONS:
+        clear_tltk_cache()
+        stage(f'g2p_{transcription}', m(lambda s: g2p(s, transcription)), sentences)
+    clear_tltk_cache()
+    stage('g2p_lexicon_tokenizer', m(lambda s: g2p(s, tokenizer='lexicon')), sentences)
+    if args.workers > 1:
+        clear_tltk_cache()
+        stage(f'g2p_batch_{args.workers}_workers',
+            lambda items: measure_batch(lambda s: g2p_batch(s, workers=args.workers), items), sentences)
+    return results
+
+def compare(results, baseline):
+    print(f"\n{'stage':<28}{'baseline /s':>14}{'current /s':>14}{'ratio':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old, new = baseline[name]['per_sec'], result['per_sec']
+        print(f'{name:<28}{old:>14.1f}{new:>14.1f}{new / old:>8.2f}')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='benchmark of each stage of thaig2p')
+    parser.add_argument('--sentences', type=int, default=300, help='number of synthetic sentences')
+    parser.add_argument('--words', type=int, default=2000, help='number of words / numbers / times for stage benchmarks')
+    parser.add_argument('--oov-words', type=int, default=20, help='number of words for tltk (slow)')
+    parser.add_argument('--oov-ratio', type=float, default=0.02, help='ratio of out-of-dictionary words in sentences')
+    parser.add_argument('--number-ratio', type=float, default=0.05)
+    parser.add_argument('--time-ratio', type=float, default=0.02)
+    parser.add_argument('--workers', type=int, default=1, help='also benchmark g2p_batch if > 1')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help='save results as JSON')
+    parser.add_argument('--compare', help='JSON of a previous run to compare with')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    warmup() # exclude import & loading dictionaries
+    warmup_s = time.perf_counter() - start
+    results = run(args)
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'args': vars(args),
+            'warmup_s': warmup_s,
+            'max_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        'stages': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f)['stages'])
+    return report
+
+if __name__ == '__main__':
+    main()
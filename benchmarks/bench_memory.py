@@ -0,0 +1,88 @@
+"""memory of worker processes with each way of loading the dictionary
+
+- csv    : every worker reads thai2phone.csv into its own dict (default)
+- mmap   : every worker maps the same compiled file (THAIG2P_LEXICON)
+- shm    : master copies the dictionary into shared memory once, workers attach (share_lexicon)
+
+workers are started by spawn (like gunicorn without preload), look up all words, and
+report memory while all of them are alive
+
+usage
+    python benchmarks/bench_memory.py --workers 8
+"""
+
+import os, sys, json, argparse, multiprocessing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from thaig2p.lexicon import memory_usage, build_lexicon, read_csv
+
+def worker(env, words, barrier, results):
+    os.environ.update(env)
+    sys.path.insert(0, ROOT)
+    from thaig2p import main
+    before = memory_usage()
+    lexicon = main._thai2phone_dict()
+    found = sum(lexicon.get(word) is not None for word in words) # touch all entries
+    after = memory_usage()
+    barrier.wait() # all workers are alive here
+    results.put({'before':before, 'after':after, 'found':found, 'shared':memory_usage()})
+    barrier.wait()
+
+def run(mode, n_workers, words, lexicon_path):
+    env = {'THAIG2P_LEXICON':'', 'THAIG2P_LEXICON_SHM':''}
+    lexicon = None
+    if mode == 'mmap':
+        env['THAIG2P_LEXICON'] = lexicon_path
+    elif mode == 'shm':
+        from thaig2p.lexicon import Lexicon
+        lexicon = Lexicon.create_shared(read_csv())
+        env['THAIG2P_LEXICON_SHM'] = lexicon.shared_name
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(n_workers)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(env, words, barrier, results)) for _ in range(n_workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    if lexicon is not None:
+        lexicon.unlink()
+    mean = lambda key, field: sum(r[key][field] or 0 for r in reports) / len(reports)
+    return {
+        'workers': n_workers,
+        'found': reports[0]['found'],
+        'dictionary_private_kib': mean('after', 'private') - mean('before', 'private'),
+        'dictionary_rss_kib': mean('after', 'rss') - mean('before', 'rss'),
+        'worker_pss_kib': mean('shared', 'pss'),
+        'worker_private_kib': mean('shared', 'private'),
+        'total_pss_kib': sum(r['shared']['pss'] or 0 for r in reports),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='memory of worker processes per dictionary mode')
+    parser.add_argument('-w', '--workers', type=int, default=4)
+    parser.add_argument('--modes', nargs='+', default=['csv', 'mmap', 'shm'], choices=['csv', 'mmap', 'shm'])
+    parser.add_argument('-o', '--output', help='save results as JSON')
+    args = parser.parse_args(argv)
+
+    words = list(read_csv())
+    lexicon_path = build_lexicon(out_path=os.path.join(ROOT, 'benchmarks', 'thai2phone.bench.bin'))
+    results = {}
+    try:
+        for mode in args.modes:
+            results[mode] = run(mode, args.workers, words, lexicon_path)
+            r = results[mode]
+            print(f"{mode:<6} dictionary +{r['dictionary_private_kib']:>8.0f} KiB private per worker, "
+                f"pss {r['worker_pss_kib']:>8.0f} KiB per worker, total pss {r['total_pss_kib']:>9.0f} KiB", file=sys.stderr)
+    finally:
+        os.remove(lexicon_path)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return results
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""benchmark of number & time reading, the current engine (thaig2p.number) vs the original recursive code
+
+corpora are random with the seed:
+- integers of 1-12 digits, with and without commas
+- decimals, negative numbers
+- times
+- long numbers (13-30 digits, the original code returns the digits as they are)
+- numeric cells of a table (repeated values), for verbalize_many()
+
+results of both are compared up to 12 digits, then timings are printed (and saved as JSON)
+
+usage
+    python benchmarks/bench_numbers.py -n 20000 -o numbers.json
+"""
+
+import os, sys, re, csv, json, time, random, argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from thaig2p.number import get_phone_number, get_phone_time, is_number, is_time, verbalize, verbalize_many, _group_phone
+
+##################################################
+### ORIGINAL CODE (for comparison)
+##################################################
+
+with open(os.path.join(ROOT, 'thaig2p', 'number2phone.csv')) as f:
+    NUMBER2PHONE_DICT = dict(csv.reader(f))
+
+def legacy_is_time(text):
+    return bool(re.match(r'[012]?[0-9][:\.][0-5][0-9](\s*)?(น.)?', text))
+
+def legacy_is_number(text):
+    return bool(re.match(r'\-?\d[\d\,]*(?:\.\d+)?$', text))
+
+def legacy_get_phone_time(time):
+    hour, minute = re.split(r'[:\.]', time)
+    minute = minute.split('น.')[0]
+    if minute == '00':
+        return legacy_get_phone_number(hour) + ' nA-1 li-4 kA-1'
+    else:
+        return legacy_get_phone_number(hour) + ' nA-1 li-4 kA-1 ' + legacy_get_phone_number(minute) + ' nA-1 TI-1'
+
+def legacy_get_phone_number(number):
+    number = str(number)
+    number2phone = NUMBER2PHONE_DICT
+    if re.match(r'0[0-9]*[1-9]+', number):
+        number = number.lstrip('0')
+    number = number.replace(',', '')
+    minus = number[0] == '-'
+    number = number.strip('-')
+    if '.' not in number:
+        length = len(number)
+        if length <= 2:
+            if number in number2phone:
+                phone = number2phone[number]
+            else:
+                phone = number2phone[number[0]+'0'] + ' ' + number2phone[number[1]]
+        elif length <= 7:
+            if number in number2phone:
+                phone = number2phone[number]
+            else:
+                phone = number2phone[number[0]+'0'*(length-1)] + ' ' + legacy_get_phone_number(number[1:])
+        elif length <= 12:
+            upper = number[:-6]
+            lower = number[-6:]
+            if lower == '000000':
+                phone = legacy_get_phone_number(upper) + ' lAn4'
+            else:
+                phone = legacy_get_phone_number(upper) + ' lAn4 ' + legacy_get_phone_number(lower)
+        else:
+            return number
+    else:
+        integer, decimal = number.split('.')
+        decimal = ' '.join([legacy_get_phone_number(x) for x in decimal])
+        phone = legacy_get_phone_number(integer) + ' cut2 ' + decimal
+    if minus:
+        return 'lop4 ' + phone
+    else:
+        return phone
+
+##################################################
+### CORPORA
+##################################################
+
+def build_corpora(n, rng):
+    integers = [str(rng.randint(0, 10 ** rng.randint(1, 12) - 1)) for _ in range(n)]
+    return {
+        'integers': integers,
+        'commas': [f'{int(x):,}' for x in integers],
+        'decimals': [f'{rng.choice(["-", ""])}{rng.randint(0, 10 ** 6)}.{rng.randint(0, 9999)}' for _ in range(n)],
+        'times': [f'{rng.randint(0, 23)}{rng.choice(".:")}{rng.randint(0, 59):02d}' for _ in range(n)],
+        'long': [str(rng.randint(10 ** 12, 10 ** rng.randint(13, 30))) for _ in range(n)],
+    }
+
+def build_table(n, rng):
+    # cells of a price table, a few hundred distinct values repeated
+    values = [f'{rng.randint(1, 10 ** 6):,}' for _ in range(300)] + [f'฿{rng.randint(1, 9999)}.{rng.randint(0, 99):02d}' for _ in range(100)]
+    return [rng.choice(values) for _ in range(n)]
+
+##################################################
+### BENCHMARK
+##################################################
+
+def timeit(func, inputs, repeat=3):
+    # best of `repeat`, seconds per input
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for x in inputs:
+            func(x)
+        best = min(best, time.perf_counter() - start)
+    return best / len(inputs)
+
+def check(corpora):
+    # same results up to 12 digits (inputs where the original code fails are skipped)
+    mismatches = 0
+    for name, inputs in corpora.items():
+        if name == 'long':
+            continue
+        old, new = (legacy_get_phone_time, get_phone_time) if name == 'times' else (legacy_get_phone_number, get_phone_number)
+        for x in inputs:
+            try:
+                expected = old(x)
+            except (KeyError, ValueError):
+                continue
+            if expected != new(x):
+                mismatches += 1
+                if mismatches <= 5:
+                    print(f'mismatch {x!r}: {expected!r} != {new(x)!r}', file=sys.stderr)
+    return mismatches
+
+def run(args):
+    rng = random.Random(args.seed)
+    corpora = build_corpora(args.n, rng)
+    results = {'mismatches': check(corpora)}
+    for name, inputs in corpora.items():
+        old, new = (legacy_get_phone_time, get_phone_time) if name == 'times' else (legacy_get_phone_number, get_phone_number)
+        _group_phone.cache_clear() # cold cache: the first repeat fills it
+        results[name] = {'legacy_us': timeit(old, inputs) * 1e6, 'current_us': timeit(new, inputs) * 1e6}
+    detect = corpora['integers'] + corpora['times']
+    results['detect'] = {
+        'legacy_us': timeit(lambda x: legacy_is_time(x) or legacy_is_number(x), detect) * 1e6,
+        'current_us': timeit(lambda x: is_time(x) or is_number(x), detect) * 1e6,
+    }
+    table = build_table(args.n, rng)
+    results['table'] = {
+        'verbalize_us': timeit(verbalize, table) * 1e6,
+        'verbalize_many_us': timeit(verbalize_many, [table]) / len(table) * 1e6,
+    }
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='benchmark of number & time reading')
+    parser.add_argument('-n', type=int, default=20000, help='number of inputs of each corpus')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help='save results as JSON')
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    print(f"mismatches with the original code: {results['mismatches']}", file=sys.stderr)
+    for name, r in results.items():
+        if name == 'mismatches':
+            continue
+        values = ', '.join(f'{k} {v:8.2f}' for k, v in r.items())
+        speedup = f"  x{r['legacy_us'] / r['current_us']:.1f}" if 'legacy_us' in r else ''
+        print(f'{name:<9} {values} (us per input){speedup}', file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return results
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""g2p from many threads at once must give the same results as sequential g2p
+
+sentences are OOV-heavy, so tltk (serialized by _TLTK_LOCK) and its cache are used by all threads.
+before each threaded run, the tltk cache is cleared and the lazily loaded globals
+(dictionary, trie, caches) are reset, so threads also race to load them
+"""
+
+import os, csv, random, threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from thaig2p import main
+
+THREADS = 8
+SENTENCES = 16
+
+def _reset(monkeypatch):
+    # back to the state before the first g2p call (restored after the test)
+    monkeypatch.setattr(main, '_THAI2PHONE_DICT', None)
+    monkeypatch.setattr(main, '_LEXICON_TRIE', (None, None))
+    monkeypatch.setattr(main, '_TLTK_CACHE', None)
+    monkeypatch.setattr(main, '_SENTENCE_CACHE', None)
+
+def _sentences():
+    # each sentence: 2 words without phone in thai2phone.csv (-> tltk) + 3 words with phone
+    with open(os.path.join(main.abs_dir, 'thai2phone.csv')) as f:
+        rows = list(csv.reader(f))
+    known = sorted({k for k, v in rows if v})
+    oov = sorted({k for k, v in rows if not v} - set(known))
+    rng = random.Random(0)
+    sentences = []
+    while len(sentences) < SENTENCES:
+        words = rng.sample(oov, 2) + rng.sample(known, 3)
+        rng.shuffle(words)
+        sentence = ' '.join(words)
+        try: # some OOV words make tltk output which cannot be converted
+            for tokenizer in ('pythainlp', 'lexicon'):
+                main.g2p(sentence, tokenizer=tokenizer)
+        except Exception:
+            continue
+        sentences.append(sentence)
+    return sentences
+
+@pytest.fixture(scope='module')
+def sentences():
+    return _sentences()
+
+def _run_threads(sentences, tokenizer):
+    # all threads start at once, each converts all sentences in its own order
+    barrier = threading.Barrier(THREADS)
+    def work(i):
+        barrier.wait()
+        order = list(range(len(sentences)))
+        random.Random(i).shuffle(order)
+        results = [None] * len(sentences)
+        for j in order:
+            results[j] = main.g2p(sentences[j], tokenizer=tokenizer, return_tokens=True)
+        return results
+    with ThreadPoolExecutor(THREADS) as executor:
+        return list(executor.map(work, range(THREADS)))
+
+@pytest.mark.parametrize('tokenizer', ['pythainlp', 'lexicon'])
+def test_threads_match_sequential(sentences, tokenizer, monkeypatch):
+    _reset(monkeypatch)
+    expected = [main.g2p(sentence, tokenizer=tokenizer, return_tokens=True) for sentence in sentences]
+    _reset(monkeypatch)
+    for results in _run_threads(sentences, tokenizer):
+        assert results == expected
+
+@pytest.mark.parametrize('tokenizer', ['pythainlp', 'lexicon'])
+def test_g2p_many_matches_sequential(sentences, tokenizer, monkeypatch):
+    _reset(monkeypatch)
+    expected = [main.g2p(sentence, tokenizer=tokenizer) for sentence in sentences]
+    _reset(monkeypatch)
+    assert main.g2p_many(sentences * 4, tokenizer=tokenizer, workers=THREADS, chunksize=1) == expected * 4
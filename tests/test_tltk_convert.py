@@ -0,0 +1,125 @@
+"""convert_tltk_syllable (one regex pass) must give the same phones as the original re.sub cascade
+
+- synthetic syllables : onset x vowel x coda x tone, with and without backslash
+- lexicon : every syllable tltk produces for the words of thai2phone.csv
+  tltk takes ~0.15 s per word, so only every 500th word by default.
+  set THAIG2P_TEST_FULL=1 to check the whole lexicon (a few hours)
+"""
+
+import os, re, csv, itertools
+from thaig2p import main
+
+##################################################
+### ORIGINAL CODE (reference)
+##################################################
+
+def reference_tokens(result):
+    return re.findall(r'<tr/>(\S+?)\|(?:<s/>|\s)', result)
+
+def reference_syllables(token):
+    return re.split(r"[|^~\']", token)
+
+def reference_convert(syl):
+    syl = syl.replace('\\', '') # remove \ e.g. เจิ้น -> c\\@n2
+    ### change encoding ###
+    tone = str(int(syl[-1])+1) # 0->1 because use 0-4 in tltk
+    if int(tone) > 5: # strangely, there are tone "8" in tltk
+        tone = str(int(tone)-5)
+    syl = syl[:-1] + tone
+    # replace vowels
+    syl = re.sub(r'iia(?=\d)', 'J-', syl) # /ia/
+    syl = re.sub(r'iia', 'J', syl)
+    syl = re.sub(r'ia', 'J-', syl)
+    syl = re.sub(r'UUa(?=\d)', 'W-', syl) # /ɯa/
+    syl = re.sub(r'UUa', 'W', syl)
+    syl = re.sub(r'Ua', 'W-', syl)
+    syl = re.sub(r'uua(?=\d)', 'R-', syl) # /ua/
+    syl = re.sub(r'uua', 'R', syl)
+    syl = re.sub(r'ua', 'R-', syl)
+    syl = re.sub(r'aa(?=\d)', 'A-', syl) # no coda
+    syl = re.sub(r'aa', 'A', syl) # with coda
+    syl = re.sub(r'a(?=\d)', 'a-', syl) # no coda
+    syl = re.sub(r'ii(?=\d)', 'I-', syl)
+    syl = re.sub(r'ii', 'I', syl)
+    syl = re.sub(r'i(?=\d)', 'i-', syl)
+    syl = re.sub(r'UU(?=\d)', 'V-', syl) # /ɯ/
+    syl = re.sub(r'UU', 'V', syl)
+    syl = re.sub(r'U(?=\d)', 'v-', syl)
+    syl = re.sub(r'U', 'v', syl)
+    syl = re.sub(r'uu(?=\d)', 'U-', syl) # /u/
+    syl = re.sub(r'uu', 'U', syl)
+    syl = re.sub(r'u(?=\d)', 'u-', syl)
+    syl = re.sub(r'xx(?=\d)', 'Y-', syl) # /ɛ/
+    syl = re.sub(r'xx', 'Y', syl)
+    syl = re.sub(r'x(?=\d)', 'y-', syl)
+    syl = re.sub(r'x', 'y', syl)
+    syl = re.sub(r'ee(?=\d)', 'E-', syl) # /e/
+    syl = re.sub(r'ee', 'E', syl)
+    syl = re.sub(r'e(?=\d)', 'e-', syl)
+    syl = re.sub(r'OO(?=\d)', 'X-', syl) # /ɔ/
+    syl = re.sub(r'OO', 'X', syl)
+    syl = re.sub(r'O(?=\d)', 'x-', syl)
+    syl = re.sub(r'O', 'x', syl)
+    syl = re.sub(r'oo(?=\d)', 'O-', syl) # /o/
+    syl = re.sub(r'oo', 'O', syl)
+    syl = re.sub(r'o(?=\d)', 'o-', syl)
+    syl = re.sub(r'@@(?=\d)', 'Z-', syl) # /ə/
+    syl = re.sub(r'@@', 'Z', syl)
+    syl = re.sub(r'@(?=\d)', 'z-', syl)
+    syl = re.sub(r'@', 'z', syl)
+    # replace consonants
+    syl = re.sub(r'th', 'T', syl)
+    syl = re.sub(r'kh', 'K', syl)
+    syl = re.sub(r'ph', 'P', syl)
+    syl = re.sub(r'ch', 'C', syl)
+    return syl
+
+def _result(convert, syl):
+    # phone, or type of exception (broken syllables must fail in the same way)
+    try:
+        return convert(syl)
+    except Exception as e:
+        return type(e)
+
+##################################################
+### TESTS
+##################################################
+
+ONSETS = ['', 'p', 'ph', 'b', 't', 'th', 'd', 'k', 'kh', 'c', 'ch', 'm', 'n', 'N', 'f', 's', 'h', 'r', 'l', 'w', 'j', '?',
+    'pr', 'pl', 'phr', 'phl', 'br', 'bl', 'fr', 'fl', 'dr', 'tr', 'thr', 'kr', 'kl', 'kw', 'khr', 'khl', 'khw']
+VOWELS = ['a', 'aa', 'i', 'ii', 'U', 'UU', 'u', 'uu', 'e', 'ee', 'x', 'xx', 'o', 'oo', 'O', 'OO', '@', '@@',
+    'ia', 'iia', 'Ua', 'UUa', 'ua', 'uua']
+CODAS = ['', 'p', 't', 'k', 'm', 'n', 'N', 'w', 'j', 'f', 's', 'l', 'c', 'ch', '?']
+TONES = '012348'
+
+def test_synthetic_syllables():
+    mismatches = []
+    for onset, vowel, coda, tone, backslash in itertools.product(ONSETS, VOWELS, CODAS, TONES, ['', '\\']):
+        syl = onset + backslash + vowel + coda + tone
+        expected = reference_convert(syl)
+        if main.convert_tltk_syllable(syl) != expected:
+            mismatches.append((syl, expected, main.convert_tltk_syllable(syl)))
+    assert mismatches == []
+
+def _lexicon_words():
+    with open(os.path.join(main.abs_dir, 'thai2phone.csv')) as f:
+        words = [row[0] for row in csv.reader(f) if row and row[0]]
+    if os.environ.get('THAIG2P_TEST_FULL'):
+        return words
+    return words[::500]
+
+def test_lexicon_syllables():
+    mismatches = []
+    for word in _lexicon_words():
+        result = main.tltkg2p(word)
+        tokens = reference_tokens(result)
+        assert main.TLTK_TOKEN_PATTERN.findall(result) == tokens
+        for token in tokens:
+            syllables = reference_syllables(token)
+            assert main.TLTK_SYLLABLE_DELIMITER.split(token) == syllables
+            for syl in syllables:
+                expected = _result(reference_convert, syl)
+                actual = _result(main.convert_tltk_syllable, syl)
+                if actual != expected:
+                    mismatches.append((word, syl, expected, actual))
+    assert mismatches == []
@@ -0,0 +1,42 @@
+"""tokenizer='lexicon' (thaig2p.tokenizer)"""
+
+import pytest
+from thaig2p import main
+from thaig2p.tokenizer import Trie, segment, tokenize
+
+LEXICON = {'ไป':'paj1', 'ไปรษณีย์':'paj1 ra-4 sa-2 nI-1', 'โรงเรียน':'rON1 rJn1', 'ราคา':'rA-1 KA-1', 'บาท':'bAt2'}
+
+def tokens(text):
+    return [token for token, _ in tokenize(text, LEXICON, Trie(LEXICON))]
+
+def test_trie():
+    trie = Trie(['ไป', 'ไปรษณีย์'])
+    assert list(trie.prefixes('ไปรษณีย์ไทย')) == [2, 8]
+    trie.remove('ไป')
+    assert 'ไป' not in trie and 'ไปรษณีย์' in trie
+
+def test_segment():
+    assert segment('ไปโรงเรียน', Trie(LEXICON)) == [('ไป', True), ('โรงเรียน', True)]
+    assert segment('ไปกขค', Trie(LEXICON)) == [('ไป', True), ('กขค', False)] # unknown chars are merged
+
+def test_tokenize_phones():
+    assert tokenize('ไปโรงเรียน 8.30', LEXICON, Trie(LEXICON)) == [('ไป', 'paj1'), ('โรงเรียน', 'rON1 rJn1'), ('8.30', None)]
+
+@pytest.mark.parametrize('text, expected', [
+    ('ราคา 100-200 บาท', ['ราคา', '100', '-', '200', 'บาท']), # range, not 100 minus 200
+    ('2020-2021', ['2020', '-', '2021']),
+    ('COVID-19', ['COVID', '-', '19']),
+    ('1.5-2.5', ['1.5', '-', '2.5']),
+    ('8.00-9.30', ['8.00', '-', '9.30']),
+    ('ราคา-5', ['ราคา', '-', '5']),
+    ('-5', ['-5']), # minus sign
+    ('ราคา -1,250.5 บาท', ['ราคา', '-1,250.5', 'บาท']),
+    ('(-5)', ['(', '-5', ')']),
+])
+def test_hyphen_and_minus(text, expected):
+    assert tokens(text) == expected
+
+@pytest.mark.parametrize('text', ['ราคา 100-200 บาท', '2020-2021', 'COVID-19'])
+def test_g2p_hyphen_is_not_minus(text):
+    phones = main.g2p(text, tokenizer='lexicon', decoded=False)
+    assert 'lop4' not in phones
@@ -1,2 +1,11 @@
 # import functions
-from thaig2p.main import g2p, decode, THAI2PHONE_DICT, NUMBER2PHONE_DICT, VOWELS, CLUSTERS, ONSETS, CODAS
\ No newline at end of file
+from thaig2p import main
+from thaig2p.main import g2p, g2p_batch, g2p_many, decode, decode_many, clean, clean_stream, warmup, load_lexicon, share_lexicon, attach_lexicon, add_user_dict, remove_user_dict, watch_user_dict, configure_tltk_cache, tltk_cache_info, configure_sentence_cache, sentence_cache_info, Token, VOWELS, CLUSTERS, ONSETS, CODAS
+from thaig2p.stats import G2PStats
+from thaig2p.session import G2PSession
+
+# dictionaries are read on first access, see thaig2p.main
+def __getattr__(name):
+    if name in ('THAI2PHONE_DICT', 'NUMBER2PHONE_DICT'):
+        return getattr(main, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
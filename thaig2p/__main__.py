@@ -0,0 +1,88 @@
+import sys, io, os, json, time, argparse, itertools
+from thaig2p.main import g2p_batch
+
+##################################################
+### COMMAND LINE
+##################################################
+
+# python -m thaig2p [files] > output
+# read line by line and write results as soon as they are produced,
+# so that files larger than memory can be processed in pipelines
+#
+# e.g.
+#   cat corpus.txt | python -m thaig2p -t ipa -w 4 > corpus.tsv
+#   python -m thaig2p a.txt b.txt --tokens -f jsonl -o out.jsonl --progress
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m thaig2p', description='Thai G2P for text files, one sentence per line')
+    parser.add_argument('files', nargs='*', default=['-'], help="input files, '-' or none for stdin")
+    parser.add_argument('-o', '--output', default='-', help="output file, '-' for stdout (default)")
+    parser.add_argument('-t', '--transcription', default='haas', choices=['haas', 'ipa', 'rtgs'])
+    parser.add_argument('-f', '--format', default='tsv', choices=['tsv', 'jsonl'],
+        help="tsv: 'sentence<TAB>phone' per line, or 'token<TAB>phone' per line with --tokens (blank line between sentences)")
+    parser.add_argument('--tokens', action='store_true', help='output phone of each token (return_tokens=True)')
+    parser.add_argument('--encoded', action='store_true', help='output encoded phone e.g. paj1 (decoded=False)')
+    parser.add_argument('--tokenizer', default='pythainlp', choices=['pythainlp', 'lexicon'])
+    parser.add_argument('-w', '--workers', type=int, default=1, help='number of worker processes (default 1)')
+    parser.add_argument('--chunksize', type=int, default=64, help='lines sent to a worker at once')
+    parser.add_argument('--progress', action='store_true', help='report throughput to stderr')
+    parser.add_argument('--progress-every', type=int, default=10000, metavar='N', help='report every N lines')
+    return parser.parse_args(argv)
+
+def read_lines(files):
+    # yield lines of all files one by one, without newline
+    for path in files:
+        if path == '-':
+            f = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+        else:
+            f = open(path, encoding='utf-8')
+        try:
+            for line in f:
+                yield line.rstrip('\r\n')
+        finally:
+            if path != '-':
+                f.close()
+
+def format_result(line, result, format, tokens):
+    if format == 'jsonl':
+        if tokens:
+            return json.dumps({'text':line, 'tokens':result}, ensure_ascii=False) + '\n'
+        return json.dumps({'text':line, 'phone':result}, ensure_ascii=False) + '\n'
+    if tokens:
+        return ''.join(f'{token}\t{phone}\n' for token, phone in result) + '\n'
+    return line.replace('\t', ' ') + '\t' + result + '\n'
+
+def report(count, start, file=sys.stderr):
+    elapsed = time.perf_counter() - start
+    print(f'{count} lines, {elapsed:.1f} s, {count / elapsed if elapsed else 0:.1f} lines/s', file=file, flush=True)
+
+def main(argv=None):
+    args = parse_args(argv)
+    lines, inputs = itertools.tee(read_lines(args.files))
+    results = g2p_batch(inputs, transcription=args.transcription, return_tokens=args.tokens, decoded=not args.encoded,
+        tokenizer=args.tokenizer, workers=args.workers, chunksize=args.chunksize, lazy=True)
+    if args.output == '-':
+        out = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', line_buffering=sys.stdout.isatty())
+    else:
+        out = open(args.output, 'w', encoding='utf-8')
+    start = time.perf_counter()
+    count = 0
+    try:
+        for line, result in zip(lines, results):
+            out.write(format_result(line, result, args.format, args.tokens))
+            count += 1
+            if args.progress and count % args.progress_every == 0:
+                report(count, start)
+        out.flush()
+    except BrokenPipeError: # e.g. python -m thaig2p | head
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    finally:
+        if args.output != '-':
+            out.close()
+    if args.progress:
+        report(count, start)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,229 @@
+import os, sys, sqlite3, threading
+from collections import OrderedDict
+
+##################################################
+### CACHES
+##################################################
+
+class LRUCache:
+    """bounded in-memory cache, the least recently used entry is evicted first
+
+    Example
+    -------
+        cache = LRUCache(maxsize=2)
+        cache.set('ไป', 'paj1')
+        cache.get('ไป')
+            'paj1'
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def info(self):
+        return {'hits':self.hits, 'misses':self.misses, 'size':len(self._data), 'maxsize':self.maxsize}
+
+
+class SQLiteCache:
+    """persistent cache in a sqlite file, shared by processes and runs
+
+    entries are stored with `namespace` (e.g. version of tltk).
+    entries of other namespaces are deleted when the cache is opened,
+    so results of an old version are never returned.
+    when there are more than `max_entries` entries, the oldest ones are deleted
+    """
+
+    def __init__(self, path, namespace, max_entries=1000000):
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._inserts = 0
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        self._connect()
+        with self._lock:
+            self._connection.execute('DELETE FROM cache WHERE namespace != ?', (namespace,))
+            self._connection.commit()
+
+    def _connect(self):
+        # sqlite connection must not be shared with forked processes
+        if self._pid == os.getpid():
+            return self._connection
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, namespace TEXT NOT NULL)')
+        self._connection, self._pid = connection, os.getpid()
+        return connection
+
+    def get(self, key, default=None):
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT value FROM cache WHERE key = ? AND namespace = ?', (key, self.namespace)).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+        return row[0]
+
+    def set(self, key, value):
+        with self._lock:
+            connection = self._connect()
+            connection.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?)', (key, value, self.namespace))
+            self._inserts += 1
+            if self._inserts % 1000 == 0: # check size once in a while
+                self._prune(connection)
+
+    def _prune(self, connection):
+        size = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if size > self.max_entries:
+            connection.execute('DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache ORDER BY rowid LIMIT ?)',
+                (size - self.max_entries,))
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute('DELETE FROM cache')
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        with self._lock:
+            return self._connect().execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def info(self):
+        return {'hits':self.hits, 'misses':self.misses, 'size':len(self), 'maxsize':self.max_entries,
+            'path':self.path, 'namespace':self.namespace}
+
+
+class TwoLevelCache:
+    """in-memory LRU in front of an optional persistent cache
+    values found in the persistent cache are copied into memory
+    """
+
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key, default=None):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return default if value is None else value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def info(self):
+        return {'memory':self.memory.info(), 'disk':None if self.disk is None else self.disk.info()}
+
+
+class SentenceCache:
+    """LRU cache of whole g2p results, bounded by number of entries and approximate bytes
+
+    results are stored as immutable tuples and a new list is returned by every get(),
+    so callers can modify returned [token, phone] lists without breaking the cache
+
+    Example
+    -------
+        cache = SentenceCache(maxsize=2)
+        cache.set(('ไป', 'haas'), [['ไป', 'pay']])
+        cache.get(('ไป', 'haas'))
+            [['ไป', 'pay']]
+    """
+
+    def __init__(self, maxsize=10000, max_bytes=64*1024*1024):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._data = OrderedDict() # key -> (result, bytes)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                result, _ = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+        if type(result) == tuple: # (token, phone) pairs -> list of [token, phone]
+            return [list(pair) for pair in result]
+        return result
+
+    def set(self, key, result):
+        if type(result) == list:
+            result = tuple(tuple(pair) for pair in result)
+        size = _sizeof(key) + _sizeof(result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self.bytes -= self._data.pop(key)[1]
+            self._data[key] = (result, size)
+            self.bytes += size
+            while len(self._data) > self.maxsize or self.bytes > self.max_bytes:
+                self.bytes -= self._data.popitem(last=False)[1][1]
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def info(self):
+        return {'hits':self.hits, 'misses':self.misses, 'evictions':self.evictions, 'size':len(self._data),
+            'maxsize':self.maxsize, 'bytes':self.bytes, 'max_bytes':self.max_bytes}
+
+def _sizeof(obj):
+    # approximate memory of str / bool / tuples of them
+    if type(obj) == tuple:
+        return sys.getsizeof(obj) + sum(_sizeof(x) for x in obj)
+    return sys.getsizeof(obj)
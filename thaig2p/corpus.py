@@ -0,0 +1,225 @@
+import itertools
+import numpy as np
+from thaig2p.main import CLUSTERS, ONSETS, VOWELS, CODAS, _thai2phone_dict
+
+##################################################
+### SYLLABLE ARRAYS
+##################################################
+
+# encoded phones of a whole corpus as small integers, for statistics with numpy
+# each syllable -> (onset id, vowel id, coda id, tone), and syllables of i-th phone
+# are syllables[offsets[i]:offsets[i+1]]
+#
+# e.g.
+#   corpus = PhoneCorpus.from_lexicon()
+#   corpus.histogram('tone')           -> {'1': ..., '2': ..., ...}
+#   corpus.ngrams('tone', 2)           -> {('1', '1'): ..., ('1', '2'): ..., ...}
+#   corpus.tones[corpus.offsets[:-1]]  -> tones of the first syllable of all words
+
+ONSET_LABELS = CLUSTERS + ONSETS # ids are indices of these lists
+VOWEL_LABELS = list(VOWELS)
+CODA_LABELS = CODAS
+TONE_LABELS = ['', '1', '2', '3', '4', '5'] # tone is stored as it is, 1-5
+UNKNOWN = 255 # id of all parts of a syllable which is not valid e.g. punctuation
+
+LABELS = {'onset':ONSET_LABELS, 'vowel':VOWEL_LABELS, 'coda':CODA_LABELS, 'tone':TONE_LABELS}
+
+_SYLLABLE_CODES = None # {encoded syllable: onset << 24 | vowel << 16 | coda << 8 | tone}
+_UNKNOWN_CODE = UNKNOWN << 24 | UNKNOWN << 16 | UNKNOWN << 8 | UNKNOWN
+
+def _syllable_codes():
+    global _SYLLABLE_CODES
+    if _SYLLABLE_CODES is None:
+        _SYLLABLE_CODES = {
+            onset + vowel + coda + tone: o << 24 | v << 16 | c << 8 | int(tone)
+            for (o, onset), (v, vowel), (c, coda), tone
+            in itertools.product(enumerate(ONSET_LABELS), enumerate(VOWEL_LABELS), enumerate(CODA_LABELS), '12345')
+        }
+    return _SYLLABLE_CODES
+
+
+class PhoneCorpus:
+    """syllables of many encoded phones in numpy arrays
+
+    Attributes
+    ----------
+    onsets, vowels, codas, tones : np.ndarray of uint8
+        ids of each syllable, labels are ONSET_LABELS[id] etc.
+    offsets : np.ndarray of int64
+        syllables of i-th phone are [offsets[i]:offsets[i+1]]
+    words : list of str or None
+        Thai words of phones, if given
+
+    Example
+    -------
+        corpus = PhoneCorpus.from_phones(['paj1', 'rON1 rJn1'])
+        corpus.syllable_counts()
+            array([1, 2])
+        corpus.get_tones(1)
+            ('1', '1')
+    """
+
+    def __init__(self, onsets, vowels, codas, tones, offsets, words=None):
+        self.onsets = onsets
+        self.vowels = vowels
+        self.codas = codas
+        self.tones = tones
+        self.offsets = offsets
+        self.words = words
+
+    @classmethod
+    def from_phones(cls, phones, words=None):
+        """encode iterable of phones e.g. ['paj1', 'rON1 rJn1']"""
+        codes = _syllable_codes()
+        lengths = []
+        syllables = []
+        for phone in phones:
+            syls = phone.split()
+            lengths.append(len(syls))
+            syllables += syls
+        packed = np.fromiter((codes.get(syl, _UNKNOWN_CODE) for syl in syllables), dtype=np.uint32, count=len(syllables))
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return cls(
+            (packed >> 24).astype(np.uint8),
+            (packed >> 16 & 0xff).astype(np.uint8),
+            (packed >> 8 & 0xff).astype(np.uint8),
+            (packed & 0xff).astype(np.uint8),
+            offsets,
+            None if words is None else list(words),
+        )
+
+    @classmethod
+    def from_lexicon(cls, lexicon=None):
+        """all words of lexicon {Thai word: phone}, THAI2PHONE_DICT by default"""
+        lexicon = _thai2phone_dict() if lexicon is None else lexicon
+        words = list(lexicon)
+        return cls.from_phones([lexicon[word] for word in words], words)
+
+    ### save / load ###
+
+    def save(self, path):
+        """save arrays as .npz, words are not saved"""
+        np.savez(path, onsets=self.onsets, vowels=self.vowels, codas=self.codas, tones=self.tones, offsets=self.offsets)
+
+    @classmethod
+    def load(cls, path, words=None):
+        with np.load(path) as f:
+            return cls(f['onsets'], f['vowels'], f['codas'], f['tones'], f['offsets'], words)
+
+    ### size ###
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def n_syllables(self):
+        return len(self.tones)
+
+    def syllable_counts(self):
+        """number of syllables of each phone"""
+        return np.diff(self.offsets)
+
+    def word_ids(self):
+        """index of phone of each syllable"""
+        return np.repeat(np.arange(len(self)), self.syllable_counts())
+
+    ### extractors ###
+
+    def array(self, part):
+        """ids of 'onset', 'vowel', 'coda', 'tone' or 'vowel_tone' of all syllables
+        vowel_tone id = vowel id * 6 + tone
+        """
+        if part == 'vowel_tone':
+            return self.vowels.astype(np.int64) * len(TONE_LABELS) + self.tones
+        return {'onset':self.onsets, 'vowel':self.vowels, 'coda':self.codas, 'tone':self.tones}[part]
+
+    def labels(self, part):
+        if part == 'vowel_tone':
+            return [v + t for v in VOWEL_LABELS for t in TONE_LABELS]
+        return LABELS[part]
+
+    def decode_ids(self, part, ids):
+        """ids -> labels, UNKNOWN -> None"""
+        labels = self.labels(part)
+        return tuple(labels[i] if i < len(labels) else None for i in ids.tolist())
+
+    def get(self, part, i):
+        """same as main.get_onsets(phone) etc. for i-th phone, e.g. get('tone', 0) -> ('1',)"""
+        start, end = self.offsets[i], self.offsets[i+1]
+        if part == 'vowel_tone':
+            return tuple(v + t for v, t in zip(self.get('vowel', i), self.get('tone', i)))
+        return self.decode_ids(part, self.array(part)[start:end])
+
+    def get_onsets(self, i):
+        return self.get('onset', i)
+
+    def get_vowels(self, i):
+        return self.get('vowel', i)
+
+    def get_codas(self, i):
+        return self.get('coda', i)
+
+    def get_tones(self, i):
+        return self.get('tone', i)
+
+    def get_vowels_tone(self, i):
+        return self.get('vowel_tone', i)
+
+    def phone(self, i):
+        """encoded phone of i-th word, invalid syllables are lost"""
+        return ' '.join(
+            '?' if UNKNOWN in (o, v, c) else ONSET_LABELS[o] + VOWEL_LABELS[v] + CODA_LABELS[c] + str(t)
+            for o, v, c, t in zip(*(self.array(part)[self.offsets[i]:self.offsets[i+1]].tolist()
+                for part in ('onset', 'vowel', 'coda', 'tone'))))
+
+    ### statistics ###
+
+    def histogram(self, part, mask=None):
+        """{label: count} of all syllables (or syllables where mask is True)
+        e.g. histogram('coda', corpus.tones == 2)
+        """
+        ids = self.array(part)
+        if mask is not None:
+            ids = ids[mask]
+        labels = self.labels(part)
+        counts = np.bincount(ids[ids < len(labels)], minlength=len(labels))
+        return {label:int(count) for label, count in zip(labels, counts) if count}
+
+    def ngrams(self, part, n=2, within_words=True):
+        """{(label, ...): count} of n consecutive syllables
+        if within_words, n-grams across words are not counted
+        """
+        ids = self.array(part)
+        size = len(ids) - n + 1
+        if size <= 0:
+            return {}
+        grams = np.stack([ids[k:k+size] for k in range(n)], axis=1) # (size, n)
+        valid = np.all(grams < len(self.labels(part)), axis=1)
+        if within_words:
+            word_ids = self.word_ids()
+            valid &= word_ids[:size] == word_ids[n-1:]
+        return self._count_rows(part, grams[valid])
+
+    def patterns(self, part='tone'):
+        """{(label, ...): count} of whole words, e.g. tone patterns {('1', '1'): ...}"""
+        ids = self.array(part)
+        counts = self.syllable_counts()
+        result = {}
+        for length in np.unique(counts).tolist(): # words of the same length at once
+            starts = self.offsets[:-1][counts == length]
+            rows = ids[starts[:, None] + np.arange(length)] # (words, length)
+            result.update(self._count_rows(part, rows))
+        return result
+
+    def _count_rows(self, part, rows):
+        # count same rows, rows of ids < 256 are packed into one int64 if possible (faster than axis=0)
+        if part == 'vowel_tone' or rows.shape[1] > 7:
+            rows, counts = np.unique(rows, axis=0, return_counts=True)
+        else:
+            packed = np.zeros(len(rows), dtype=np.int64)
+            for k in range(rows.shape[1]):
+                packed = packed << 8 | rows[:, k]
+            packed, counts = np.unique(packed, return_counts=True)
+            rows = np.stack([packed >> 8 * (rows.shape[1] - 1 - k) & 0xff for k in range(rows.shape[1])], axis=1)
+        return {self.decode_ids(part, row):count for row, count in zip(rows, counts.tolist())}
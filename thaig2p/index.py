@@ -0,0 +1,112 @@
+import unicodedata
+from collections import defaultdict
+from thaig2p.main import _thai2phone_dict, encode_haas, validate
+
+##################################################
+### PHONOLOGICAL INDEX
+##################################################
+
+# find Thai words by pronunciation, without scanning the whole dictionary
+#
+#   index = PhoneIndex()
+#   index.homophones('kAw3')              -> ('ก้าว', 'ข้าว', ...)
+#   index.rhymes('rJn1')                  -> words ending with -ian (tone 1)
+#   index.tone_pattern('13')              -> words of 2 syllables with tones 1 & 3
+#   index.homophones('khâaw', haas=True)  -> same as 'KAw3'
+#
+# all queries are dict lookups (+ set intersection for several syllables)
+
+
+class PhoneIndex:
+    """inverted index of a lexicon {Thai word: encoded phone} by
+    - full phone
+    - each syllable
+    - rhyme (vowel, coda, tone) and (vowel, coda) of the last syllable
+    - tone pattern
+
+    Parameters
+    ----------
+    lexicon : dict
+        {Thai word: encoded phone}, THAI2PHONE_DICT by default
+
+    Example
+    -------
+        index = PhoneIndex({'ไป':'paj1', 'ใป':'paj1', 'ใจ':'caj1'})
+        index.homophones('paj1')
+            ('ใป', 'ไป')
+        index.rhymes('paj1')
+            ('ใจ', 'ใป', 'ไป')
+    """
+
+    def __init__(self, lexicon=None):
+        lexicon = _thai2phone_dict() if lexicon is None else lexicon
+        by_phone = defaultdict(list)
+        by_syllable = defaultdict(set)
+        by_rhyme = defaultdict(list)
+        by_rhyme_toneless = defaultdict(list)
+        by_tones = defaultdict(list)
+        for word, phone in lexicon.items():
+            syls = phone.split()
+            if not syls:
+                continue
+            by_phone[' '.join(syls)].append(word)
+            for syl in syls:
+                by_syllable[syl].add(word)
+            last = syls[-1]
+            by_rhyme[last[-3:]].append(word) # vowel + coda + tone e.g. Jn1
+            by_rhyme_toneless[last[-3:-1]].append(word)
+            by_tones[''.join(syl[-1] for syl in syls)].append(word)
+        # lists -> sorted tuples, results can be returned as they are
+        self.by_phone = _freeze(by_phone)
+        self.by_syllable = {syl:frozenset(words) for syl, words in by_syllable.items()}
+        self.by_rhyme = _freeze(by_rhyme)
+        self.by_rhyme_toneless = _freeze(by_rhyme_toneless)
+        self.by_tones = _freeze(by_tones)
+
+    def __len__(self):
+        return sum(len(words) for words in self.by_phone.values())
+
+    ### queries ###
+
+    def homophones(self, phone, haas=False):
+        """words pronounced as phone e.g. 'KAw3' (or Haas 'khâaw' with haas=True)"""
+        return self.by_phone.get(' '.join(_to_syllables(phone, haas)), ())
+
+    def with_syllables(self, *syls, haas=False):
+        """words which contain all given syllables, e.g. with_syllables('rON1', 'rJn1')"""
+        syls = [syl for s in syls for syl in _to_syllables(s, haas)]
+        if not syls:
+            return ()
+        sets = sorted((self.by_syllable.get(syl, frozenset()) for syl in syls), key=len)
+        return tuple(sorted(sets[0].intersection(*sets[1:])))
+
+    def rhymes(self, phone, tone=True, haas=False):
+        """words whose last syllable has the same vowel & coda (& tone) as the last syllable of phone"""
+        last = _to_syllables(phone, haas)[-1]
+        if tone:
+            return self.by_rhyme.get(last[-3:], ())
+        return self.by_rhyme_toneless.get(last[-3:-1], ())
+
+    def tone_pattern(self, tones):
+        """words with the tones, e.g. '13' or (1, 3) -> 2 syllables, tone 1 and 3"""
+        return self.by_tones.get(''.join(str(tone) for tone in tones), ())
+
+
+def _freeze(index):
+    return {key:tuple(sorted(words)) for key, words in index.items()}
+
+def _to_syllables(phone, haas=False):
+    # encoded phone (str or list) or Haas -> list of encoded syllables
+    if haas:
+        # decomposed characters are used in HAAS2PHONE, e.g. 'â' = 'a' + '̂'
+        try:
+            encoded = encode_haas(unicodedata.normalize('NFD', phone.strip()))
+        except (IndexError, KeyError, UnboundLocalError): # e.g. no vowel, unknown onset
+            encoded = None
+        if encoded is None or not validate(encoded):
+            raise ValueError(f'cannot encode Haas: {phone!r}, syllables must be delimited by spaces')
+        return encoded.split()
+    syls = phone.split() if type(phone) == str else list(phone)
+    if not syls or not validate(' '.join(syls)):
+        raise ValueError(f'invalid phone: {phone!r}')
+    return syls
@@ -0,0 +1,313 @@
+import csv, os, sys, mmap, struct, atexit, argparse
+from multiprocessing import shared_memory
+from array import array
+from collections.abc import Mapping
+
+##################################################
+### BINARY LEXICON
+##################################################
+
+# compiled lexicon = sorted string table, read directly from mmap
+#
+# header
+#   magic (8 bytes) + number of entries (uint32) + number of columns (uint32)
+#   for each column: name (16 bytes) + position of offsets (uint32) + position of blob (uint32)
+# columns
+#   offsets : uint32 x (entries + 1), little endian
+#   blob    : utf-8 strings concatenated, i-th string is blob[offsets[i]:offsets[i+1]]
+# column 0 is the key (Thai word), sorted by utf-8 bytes
+# column 1 is the encoded phone
+# other columns (optional) are phones pre-rendered into each transcription, e.g. 'haas', 'ipa', 'rtgs'
+#   g2p returns them as they are instead of decoding the phone of every token.
+#   '' if the phone is invalid (decoded at runtime as before)
+
+MAGIC = b'TG2PLEX1'
+_HEADER = struct.Struct('<8sII')
+_COLUMN = struct.Struct('<16sII')
+
+abs_dir = os.path.dirname(__file__)
+DEFAULT_CSV = abs_dir + '/thai2phone.csv'
+DEFAULT_LEXICON = abs_dir + '/thai2phone.bin'
+TRANSCRIPTIONS = ('haas', 'ipa', 'rtgs') # pre-rendered by default
+
+def _uint32_array(buffer):
+    # zero-copy view on little endian machines, copy otherwise
+    if sys.byteorder == 'little':
+        return buffer.cast('I')
+    offsets = array('I', bytes(buffer))
+    offsets.byteswap()
+    return offsets
+
+def _pad4(data):
+    return data + b'\0' * (-len(data) % 4)
+
+def write_lexicon(path, columns):
+    """write columns into a binary lexicon file
+
+    Parameters
+    ----------
+    path : str
+        output file
+    columns : dict
+        {column name: list of str}, the first column is the key and must be sorted
+    """
+    data = encode_lexicon(columns)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path) # readers never see a half-written file
+
+def encode_lexicon(columns):
+    """binary lexicon of columns as bytes, see write_lexicon()"""
+    names = list(columns)
+    n = len(columns[names[0]])
+    position = _HEADER.size + _COLUMN.size * len(names)
+    headers, chunks = [], []
+    for name in names:
+        encoded = [value.encode('utf-8') for value in columns[name]]
+        offsets = array('I', [0])
+        for value in encoded:
+            offsets.append(offsets[-1] + len(value))
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+        offsets_bytes = offsets.tobytes()
+        blob = _pad4(b''.join(encoded))
+        headers.append(_COLUMN.pack(name.encode('ascii'), position, position + len(offsets_bytes)))
+        chunks += [offsets_bytes, blob]
+        position += len(offsets_bytes) + len(blob)
+    return b''.join([_HEADER.pack(MAGIC, n, len(names))] + headers + chunks)
+
+def read_csv(csv_path=DEFAULT_CSV):
+    # same as thaig2p.main, entries without phone are dropped
+    with open(csv_path) as f:
+        return {k:v for k,v in dict(csv.reader(f)).items() if v != ''}
+
+def lexicon_columns(thai2phone, transcriptions=()):
+    # {Thai word: phone} -> columns of binary lexicon, + pre-rendered phones
+    keys = sorted(thai2phone, key=lambda k: k.encode('utf-8'))
+    columns = {'key':keys, 'phone':[thai2phone[k] for k in keys]}
+    for transcription in transcriptions:
+        columns[transcription.lower()] = render_phones(columns['phone'], transcription)
+    return columns
+
+def render_phones(phones, transcription):
+    """decode(phone, transcription) of each phone, '' if the phone is invalid by validate()"""
+    from thaig2p.main import decode, validate
+    return [decode(phone, transcription) if validate(phone) else '' for phone in phones]
+
+def build_lexicon(csv_path=DEFAULT_CSV, out_path=DEFAULT_LEXICON, transcriptions=TRANSCRIPTIONS):
+    """compile thai2phone.csv into a binary lexicon for Lexicon.open()
+
+    Parameters
+    ----------
+    transcriptions : tuple of str
+        phones are pre-rendered into these transcriptions, () for phones only.
+        entries with invalid phones are reported and left to decode at runtime
+
+    Return
+    ------
+    str
+        path of the compiled lexicon
+    """
+    columns = lexicon_columns(read_csv(csv_path), transcriptions)
+    if transcriptions:
+        invalid = [f'{k}:{phone}' for k, phone, rendered
+            in zip(columns['key'], columns['phone'], columns[transcriptions[0].lower()]) if not rendered]
+        if invalid:
+            print(f'{len(invalid)} entries with invalid phones are not pre-rendered, e.g.', ', '.join(invalid[:5]), file=sys.stderr)
+    write_lexicon(out_path, columns)
+    return out_path
+
+
+class Lexicon(Mapping):
+    """read-only {Thai word: phone} mapping on a compiled lexicon
+
+    the data is never copied into Python objects, lookups binary-search the buffer.
+    when opened by Lexicon.open(), all processes share the same pages of the file
+
+    Example
+    -------
+        lexicon = Lexicon.open('thai2phone.bin')
+        lexicon['ไป']
+            'paj1'
+    """
+
+    def __init__(self, buffer):
+        view = memoryview(buffer)
+        self._raw = view.obj # mmap or bytes, slicing it returns bytes directly
+        magic, self._size, n_columns = _HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise ValueError('not a thaig2p lexicon')
+        self._offsets, self._blob_pos = {}, {}
+        for i in range(n_columns):
+            name, offsets_pos, blob_pos = _COLUMN.unpack_from(view, _HEADER.size + _COLUMN.size * i)
+            name = name.rstrip(b'\0').decode('ascii')
+            self._offsets[name] = _uint32_array(view[offsets_pos:blob_pos])
+            self._blob_pos[name] = blob_pos
+        self.columns = tuple(self._offsets)
+
+    @classmethod
+    def open(cls, path=DEFAULT_LEXICON):
+        with open(path, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    ### shared memory ###
+
+    @classmethod
+    def create_shared(cls, data, name=None, transcriptions=TRANSCRIPTIONS):
+        """copy binary lexicon (bytes, or {Thai word: phone}) into a new shared memory segment
+        the segment stays until unlink() is called (or the creating process exits).
+        phones of dict are pre-rendered into transcriptions
+        """
+        if not isinstance(data, (bytes, bytearray)):
+            data = encode_lexicon(lexicon_columns(data, transcriptions))
+        shm = shared_memory.SharedMemory(name=name, create=True, size=len(data))
+        shm.buf[:len(data)] = data
+        return cls._from_shared(shm)
+
+    @classmethod
+    def attach(cls, name):
+        """use lexicon in shared memory created by another process, without copying"""
+        return cls._from_shared(_attach_shared_memory(name))
+
+    @classmethod
+    def _from_shared(cls, shm):
+        lexicon = cls(shm.buf)
+        lexicon._shm = shm
+        atexit.register(lexicon.close) # views must be released before the segment is closed
+        return lexicon
+
+    @property
+    def shared_name(self):
+        """name of shared memory segment, None if not in shared memory"""
+        shm = getattr(self, '_shm', None)
+        return None if shm is None else shm.name
+
+    def close(self):
+        """release the buffer, the lexicon cannot be used after this"""
+        for offsets in self._offsets.values():
+            if isinstance(offsets, memoryview):
+                offsets.release()
+        self._offsets = {}
+        self._raw = None
+        shm = getattr(self, '_shm', None)
+        if shm is not None:
+            shm.close()
+
+    def unlink(self):
+        """remove the shared memory segment, attached processes can keep using it"""
+        self._shm.unlink()
+
+    def _value(self, i, column):
+        offsets, pos = self._offsets[column], self._blob_pos[column]
+        return str(self._raw[pos+offsets[i]:pos+offsets[i+1]], 'utf-8')
+
+    def index(self, word):
+        """position of the word in the lexicon, or -1"""
+        key = word.encode('utf-8')
+        raw, offsets, pos = self._raw, self._offsets['key'], self._blob_pos['key']
+        low, high = 0, self._size
+        while low < high: # binary search
+            mid = (low + high) // 2
+            if raw[pos+offsets[mid]:pos+offsets[mid+1]] < key:
+                low = mid + 1
+            else:
+                high = mid
+        if low < self._size and raw[pos+offsets[low]:pos+offsets[low+1]] == key:
+            return low
+        return -1
+
+    def lookup(self, word, column='phone', default=None):
+        """get any column of the word e.g. lookup('ไป', 'phone') -> 'paj1'"""
+        i = self.index(word)
+        if i < 0:
+            return default
+        return self._value(i, column)
+
+    def get(self, word, default=None):
+        return self.lookup(word, 'phone', default)
+
+    def renderer(self, transcription):
+        """function of word -> (phone, pre-rendered phone) or None if not found, for g2p
+        both are read by one search. None if the transcription is not pre-rendered
+        """
+        column = transcription.lower()
+        if column not in self._offsets or column in ('key', 'phone'):
+            return None
+        index, value = self.index, self._value
+        def render(word):
+            i = index(word)
+            if i < 0:
+                return None
+            return value(i, 'phone'), value(i, column)
+        return render
+
+    def to_bytes(self):
+        """whole binary lexicon, e.g. to copy it into shared memory with all columns"""
+        return bytes(self._raw)
+
+    def __getitem__(self, word):
+        i = self.index(word)
+        if i < 0:
+            raise KeyError(word)
+        return self._value(i, 'phone')
+
+    def __contains__(self, word):
+        return isinstance(word, str) and self.index(word) >= 0
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self._value(i, 'key')
+
+
+def _attach_shared_memory(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False) # python >= 3.13
+    except TypeError:
+        pass
+    # before 3.13, the resource tracker of a process which only attaches removes the segment
+    # when the process exits. skip registration, the creator is responsible for unlink()
+    from multiprocessing import resource_tracker
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def memory_usage(pid='self'):
+    """memory of a process in KiB from /proc (Linux), to compare workers with/without shared lexicon
+    rss : resident memory, pages shared with other processes are counted in each process
+    pss : rss where shared pages are divided by the number of processes sharing them
+    private : pages used only by this process (what is freed when the process exits)
+    """
+    usage = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if value.strip().endswith('kB'):
+                    usage[key] = int(value.split()[0])
+    except OSError: # not Linux, only peak rss
+        import resource
+        return {'rss':resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    return {
+        'rss': usage.get('Rss'),
+        'pss': usage.get('Pss'),
+        'private': usage.get('Private_Clean', 0) + usage.get('Private_Dirty', 0),
+        'shared': usage.get('Shared_Clean', 0) + usage.get('Shared_Dirty', 0),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='compile thai2phone.csv into a binary lexicon')
+    parser.add_argument('csv', nargs='?', default=DEFAULT_CSV)
+    parser.add_argument('out', nargs='?', default=DEFAULT_LEXICON)
+    parser.add_argument('-t', '--transcriptions', nargs='*', default=list(TRANSCRIPTIONS),
+        help='pre-render phones into these transcriptions (none for phones only)')
+    args = parser.parse_args()
+    print(build_lexicon(args.csv, args.out, tuple(args.transcriptions)))
@@ -1,6 +1,11 @@
-import csv, os, html, re
-from pythainlp import word_tokenize
-from tltk import g2p as tltkg2p
+import csv, os, re, itertools, collections, threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from thaig2p.normalize import clean, clean_stream
+from thaig2p.cache import LRUCache, SQLiteCache, TwoLevelCache, SentenceCache
+from thaig2p.stats import G2PStats
+from thaig2p.tokenizer import Trie, tokenize as _tokenize_lexicon
+from thaig2p.number import _number2phone_dict, is_time, get_phone_time, is_number, get_phone_number
 
 ##################################################
 ### CONSTANTS
@@ -15,12 +20,195 @@ ONSETS = ["b","p","P","m","f","d","t","T","n","s","r","l","c","C","k","K","N","w
 CODAS = ["p","m","f","t","d","n","s","l","c","k","N","w","j","?","-"]
 
 ### read dictionary
+# dictionaries are read on first use, not at import
+# THAI2PHONE_DICT and NUMBER2PHONE_DICT are still available as module attributes
 abs_dir = os.path.dirname(__file__)
-with open(abs_dir + '/thai2phone.csv') as f:
-    THAI2PHONE_DICT = dict(csv.reader(f))
-    THAI2PHONE_DICT = {k:v for k,v in THAI2PHONE_DICT.items() if v != ''}
-with open(abs_dir + '/number2phone.csv') as f:
-    NUMBER2PHONE_DICT = dict(csv.reader(f))
+_THAI2PHONE_DICT = None
+
+### thread safety
+# g2p can be called from many threads at once. shared objects are
+# - dictionaries, trie, caches : built once under _LOAD_LOCK, then only read
+#   (user dictionaries replace whole dicts, caches have their own locks)
+# - tltk : uses module globals during conversion, so calls are serialized by _TLTK_LOCK
+# - pythainlp (newmm) : keeps no state between calls, called without lock
+_LOAD_LOCK = threading.RLock()
+_TLTK_LOCK = threading.Lock()
+
+def _thai2phone_dict():
+    global _THAI2PHONE_DICT
+    if _THAI2PHONE_DICT is None:
+        with _LOAD_LOCK:
+            if _THAI2PHONE_DICT is not None: # loaded by another thread meanwhile
+                return _THAI2PHONE_DICT
+            if os.environ.get('THAIG2P_LEXICON_SHM'): # shared memory created by share_lexicon()
+                attach_lexicon(os.environ['THAIG2P_LEXICON_SHM'])
+            elif os.environ.get('THAIG2P_LEXICON'): # compiled lexicon, see thaig2p.lexicon
+                load_lexicon(os.environ['THAIG2P_LEXICON'])
+            else:
+                with open(abs_dir + '/thai2phone.csv') as f:
+                    _THAI2PHONE_DICT = {k:v for k,v in dict(csv.reader(f)).items() if v != ''}
+    return _THAI2PHONE_DICT
+
+def load_lexicon(path):
+    """use a compiled lexicon (mmap) instead of thai2phone.csv
+    build it by `python -m thaig2p.lexicon`, or set THAIG2P_LEXICON=path before the first g2p call
+    """
+    from thaig2p.lexicon import Lexicon
+    return _set_lexicon(Lexicon.open(path))
+
+def share_lexicon(name=None):
+    """copy the dictionary into shared memory once, for many worker processes
+    call it in the master process before starting workers (e.g. gunicorn on_starting hook).
+    THAIG2P_LEXICON_SHM is set, so that workers attach to the segment instead of reading csv.
+    the segment is removed when this process exits
+
+    Return
+    ------
+    str
+        name of shared memory segment
+    """
+    import atexit
+    from thaig2p.lexicon import Lexicon
+    lexicon = _base_lexicon() # user dictionaries are not shared
+    if getattr(lexicon, 'shared_name', None) is None:
+        # compiled lexicon is copied as it is, dict is compiled with pre-rendered phones
+        data = lexicon.to_bytes() if isinstance(lexicon, Lexicon) else dict(lexicon.items())
+        lexicon = Lexicon.create_shared(data, name)
+        atexit.register(lexicon.unlink)
+        _set_lexicon(lexicon)
+    os.environ['THAIG2P_LEXICON_SHM'] = lexicon.shared_name
+    return lexicon.shared_name
+
+def attach_lexicon(name):
+    """use the dictionary in shared memory created by share_lexicon() in another process"""
+    from thaig2p.lexicon import Lexicon
+    return _set_lexicon(Lexicon.attach(name))
+
+def _set_lexicon(lexicon):
+    global _THAI2PHONE_DICT
+    from thaig2p.overlay import LayeredLexicon
+    with _LOAD_LOCK:
+        layered = _THAI2PHONE_DICT if isinstance(_THAI2PHONE_DICT, LayeredLexicon) else None
+        if layered is None:
+            _THAI2PHONE_DICT = lexicon
+            _invalidate_results()
+    if layered is not None: # keep user dictionaries on the new lexicon (outside lock, listeners take it)
+        layered.set_base(lexicon)
+    return lexicon
+
+def _base_lexicon():
+    # built-in dictionary under user dictionaries
+    lexicon = _thai2phone_dict()
+    return getattr(lexicon, 'base', lexicon)
+
+### user dictionaries, see thaig2p.overlay
+def user_lexicon():
+    """LayeredLexicon of user dictionaries on top of the dictionary (created on first call)"""
+    global _THAI2PHONE_DICT, _LEXICON_TRIE
+    from thaig2p.overlay import LayeredLexicon
+    with _LOAD_LOCK:
+        lexicon = _thai2phone_dict()
+        if not isinstance(lexicon, LayeredLexicon):
+            layered = LayeredLexicon(lexicon)
+            layered.subscribe(_on_lexicon_update)
+            if _LEXICON_TRIE[0] is lexicon: # same words, keep the trie
+                _LEXICON_TRIE = (layered, _LEXICON_TRIE[1])
+            _THAI2PHONE_DICT = lexicon = layered
+    return lexicon
+
+def add_user_dict(entries, name='user', strict=True):
+    """add user dictionary {Thai word: encoded phone} on top of the dictionary
+
+    Parameters
+    ----------
+    entries : dict or str
+        {Thai word: encoded phone}, or path of csv (Thai word,phone per line)
+    name : str
+        name of the dictionary, adding with the same name replaces it
+    strict : bool
+        if True, raise ValueError when there are invalid phones (checked by validate())
+        if False, invalid entries are skipped
+
+    Return
+    ------
+    dict
+        {Thai word: phone} of skipped entries
+
+    Example
+    -------
+        add_user_dict({'ไลน์แมน':'lAj1 mEn1'})
+        g2p('ไลน์แมน')
+            'laymɛɛn'
+    """
+    if type(entries) == str:
+        from thaig2p.overlay import read_user_dict
+        entries = read_user_dict(entries)
+    return user_lexicon().set_layer(name, entries, strict)
+
+def remove_user_dict(name='user'):
+    user_lexicon().remove_layer(name)
+
+def watch_user_dict(path, name=None, interval=1.0, strict=False):
+    """add user dictionary from csv file and reload it in background when the file is modified
+    returns UserDictWatcher, call .stop() to stop watching
+    """
+    from thaig2p.overlay import UserDictWatcher
+    return UserDictWatcher(user_lexicon(), path, name, interval, strict).start()
+
+def _on_lexicon_update(changed, removed):
+    # apply only changed words to the trie of tokenizer='lexicon'
+    global _LEXICON_TRIE
+    with _LOAD_LOCK: # not while the trie is being built
+        trie = _LEXICON_TRIE[1]
+        if changed is None: # base lexicon is replaced, rebuild on next use
+            _LEXICON_TRIE = (None, None)
+        elif trie is not None:
+            for word in changed:
+                trie.add(word)
+            for word in removed:
+                trie.remove(word)
+    _invalidate_results()
+
+def __getattr__(name):
+    # e.g. thaig2p.main.THAI2PHONE_DICT -> read csv at this point
+    if name == 'THAI2PHONE_DICT':
+        return _thai2phone_dict()
+    elif name == 'NUMBER2PHONE_DICT':
+        return _number2phone_dict()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+### heavy dependencies are imported on first use
+def word_tokenize(text, **kwargs):
+    from pythainlp import word_tokenize as pythainlp_word_tokenize
+    return pythainlp_word_tokenize(text, **kwargs)
+
+def tltkg2p(thaiword):
+    with _TLTK_LOCK: # tltk is not reentrant
+        from tltk import g2p as tltk_g2p
+        return tltk_g2p(thaiword)
+
+_LEXICON_TRIE = (None, None) # (lexicon, trie of its words)
+
+def _lexicon_trie():
+    # trie for tokenizer='lexicon', rebuilt when lexicon is replaced
+    global _LEXICON_TRIE
+    lexicon = _thai2phone_dict()
+    lexicon_trie = _LEXICON_TRIE # read once, may be replaced by other threads
+    if lexicon_trie[0] is not lexicon:
+        with _LOAD_LOCK:
+            if _LEXICON_TRIE[0] is not lexicon:
+                _LEXICON_TRIE = (lexicon, Trie(lexicon))
+            lexicon_trie = _LEXICON_TRIE
+    return lexicon_trie[1]
+
+def warmup():
+    """load dictionaries and import pythainlp & tltk now instead of on first call
+    useful for long-running services to avoid a slow first request
+    """
+    _thai2phone_dict()
+    _number2phone_dict()
+    word_tokenize('ไปโรงเรียน', keep_whitespace=False)
+    tltkg2p('ไปโรงเรียน')
 
 ##################################################
 ### UTILS FOR HANDLING PHONES
@@ -96,144 +284,115 @@ def get_vowels_tone(phone:str):
     """
     return tuple(syl[-3]+syl[-1] for syl in phone.split())
 
-def clean(text:str):
-    text = html.unescape(text)
-    text = re.sub(r'[\n\s]+', ' ', text) # shrink whitespaces
-    text = re.sub(r'https?://[^\s]+((?=\s)|(?=$))', '', text) # remove URL
-    text = re.sub(r'\((.+?)\)', r'( \1 )', text) # add space before/after parentheses
-    text = re.sub(r'\"(.+?)\"', r'" \1 "', text) # add space before/after quotation
-    text = re.sub(r'[“”„]', '"', text) # convert double quotations into "
-    text = re.sub(r'[‘’`]', "'", text) # convert single quotations into '
-    text = re.sub(r'[ \u00a0\xa0\u3000\u2002-\u200a\t]+', ' ', text) # e.g. good  boy -> good boy
-    text = re.sub(r'[\r\u200b\ufeff]+', '', text) # remove non-breaking space
-    return text.strip()
-
 def get_phone_word(thaiword:str):
     # if the word in the dict, return the phone
     # ไป -> paj1
-    return THAI2PHONE_DICT.get(thaiword, None)
-
-def is_time(text:str):
-    # 8:00, 09.12, 12:12, 23.31น., etc
-    return bool(re.match(r'[012]?[0-9][:\.][0-5][0-9](\s*)?(น.)?', text))
-
-def get_phone_time(time:str):
-    # 20.31 -> jI-3 sip2 nA-1 liʔ4 kA-1 sAm5 sip2 ʔet2 nA-1 TI-1
-    hour, minute = re.split(r'[:\.]', time) # 23.31น. -> [23, 31น.]
-    minute = minute.split('น.')[0] # 31น. -> 31
-    if minute == '00':
-        return get_phone_number(hour) + ' nA-1 li-4 kA-1' # 8.00 -> pYt2 nA-1 li-4 kA-1
-    else:
-        return get_phone_number(hour) + ' nA-1 li-4 kA-1 ' + get_phone_number(minute) + ' nA-1 TI-1'
-
-def is_number(text:str):
-    return bool(re.match(r'\-?\d[\d\,]*(?:\.\d+)?$', text))
-
-def get_phone_number(number:str):
-    # 3,120 -> sAm5 Pan1 rXj4 jI-3 sip2
-    # 123.123 -> nɯŋ2 rXj4 jI-3 sip2 sAm5 cut2 nɯŋ2 sXŋ5 sAm5
-    number = str(number) # float 123.5 -> str "123.5"
-    if re.match(r'0[0-9]*[1-9]+', number): # e.g. 0012 (exclude 0, 00)
-        number = number.lstrip('0') # 0012 -> 12
-    number = number.replace(',', '') # 1,000 -> 1000
-    minus = number[0] == '-' # bool to check negative
-    number = number.strip('-') # delete initial -
-    if '.' not in number: # if integer
-        length = len(number)
-        if length <= 2:
-            if number in NUMBER2PHONE_DICT:
-                phone = NUMBER2PHONE_DICT[number]
-            else:
-                phone = NUMBER2PHONE_DICT[number[0]+'0'] + ' ' + NUMBER2PHONE_DICT[number[1]] # 34 -> 30 + 4
-        elif length <= 7: # 7 = million = ล้าน
-            if number in NUMBER2PHONE_DICT:
-                phone = NUMBER2PHONE_DICT[number]
-            else:
-                phone = NUMBER2PHONE_DICT[number[0]+'0'*(length-1)] + ' ' + get_phone_number(number[1:]) # 345 -> 300 + 45 (recursive)
-        elif length <= 12: # 12 = trillion = ล้านล้าน
-            # 123456000 -> 123 + ล้าน + 456000
-            upper = number[:-6]
-            lower = number[-6:] # xxx ล้าน
-            if lower == '000000':
-                phone = get_phone_number(upper) + ' lAn4'
-            else:
-                phone = get_phone_number(upper) + ' lAn4 ' + get_phone_number(lower)
-        else:
-            return number # longer than 12, return original
-    else: # if decimal
-        integer, decimal = number.split('.')
-        decimal = ' '.join([get_phone_number(x) for x in decimal]) # get one by one
-        phone = get_phone_number(integer) + ' cut2 ' + decimal
-    if minus:
-        return 'lop4 ' + phone
-    else:
-        return phone
+    return _thai2phone_dict().get(thaiword, None)
+
+# tltk notation -> encoded phone, as (no coda, with coda)
+# e.g. paa0 -> pA-1, paan0 -> pAn1
+# order matters: the first alternative matching at a position is used
+TLTK2PHONE = {
+    'iia':('J-','J'), 'UUa':('W-','W'), 'uua':('R-','R'), # diphthongs
+    'ia' :('J-','J-'), 'Ua' :('W-','W-'), 'ua' :('R-','R-'),
+    'aa' :('A-','A'), 'ii' :('I-','I'), 'UU' :('V-','V'), 'uu' :('U-','U'), # long vowels
+    'xx' :('Y-','Y'), 'ee' :('E-','E'), 'OO' :('X-','X'), 'oo' :('O-','O'), '@@' :('Z-','Z'),
+    'th' :('T','T'), 'kh' :('K','K'), 'ph' :('P','P'), 'ch' :('C','C'), # aspirated consonants
+    'a'  :('a-','a'), 'i'  :('i-','i'), 'U'  :('v-','v'), 'u'  :('u-','u'), 'x'  :('y-','y'), # short vowels
+    'e'  :('e-','e'), 'O'  :('x-','x'), 'o'  :('o-','o'), '@'  :('z-','z'),
+}
+TLTK_PATTERN = re.compile('|'.join(re.escape(symbol) for symbol in TLTK2PHONE))
+TLTK_TOKEN_PATTERN = re.compile(r'<tr/>(\S+?)\|(?:<s/>|\s)')
+TLTK_SYLLABLE_DELIMITER = re.compile(r"[|^~\']")
+
+def _tltk_symbol2phone(match):
+    # vowel followed by tone digit = no coda
+    end = match.end()
+    has_coda = not match.string[end:end+1].isdigit()
+    return TLTK2PHONE[match.group()][has_coda]
+
+def convert_tltk_syllable(syl:str):
+    """convert one syllable of tltk into encoded phone
+    >>> convert_tltk_syllable('khaaw2') -> KAw3
+    """
+    syl = syl.replace('\\', '') # remove \ e.g. เจิ้น -> c\\@n2
+    tone = int(syl[-1]) + 1 # 0->1 because use 0-4 in tltk
+    if tone > 5: # strangely, there are tone "8" in tltk
+        tone -= 5
+    return TLTK_PATTERN.sub(_tltk_symbol2phone, syl[:-1] + str(tone))
+
+### cache of tltk results, memory (LRU) + optional sqlite file
+TLTK_CACHE_VERSION = 1 # increment when conversion of tltk output changes
+_TLTK_CACHE = None
+
+def configure_tltk_cache(maxsize=10000, cache_dir=None, max_disk_entries=1000000):
+    """configure cache of get_phone_word_tltk
+
+    Parameters
+    ----------
+    maxsize : int
+        max number of words kept in memory (LRU)
+    cache_dir : str
+        directory of persistent cache shared by processes, default is $THAIG2P_CACHE_DIR
+        if None, only memory cache is used
+    max_disk_entries : int
+        max number of words in persistent cache
+
+    Return
+    ------
+    TwoLevelCache
+    """
+    global _TLTK_CACHE
+    cache_dir = cache_dir or os.environ.get('THAIG2P_CACHE_DIR')
+    disk = None
+    if cache_dir:
+        cache_dir = os.path.expanduser(os.path.expandvars(cache_dir)) # ~/.cache/thaig2p, $HOME/...
+        disk = SQLiteCache(os.path.join(cache_dir, 'tltk.sqlite3'), _tltk_cache_namespace(), max_disk_entries)
+    _TLTK_CACHE = TwoLevelCache(LRUCache(maxsize), disk)
+    return _TLTK_CACHE
+
+def _tltk_cache_namespace():
+    # cached results are invalid when tltk is updated
+    from importlib.metadata import version, PackageNotFoundError
+    try:
+        tltk_version = version('tltk')
+    except PackageNotFoundError:
+        tltk_version = 'unknown'
+    return f'tltk-{tltk_version}-{TLTK_CACHE_VERSION}'
+
+def _tltk_cache():
+    cache = _TLTK_CACHE
+    if cache is None:
+        with _LOAD_LOCK:
+            if _TLTK_CACHE is None:
+                configure_tltk_cache()
+            cache = _TLTK_CACHE
+    return cache
+
+def tltk_cache_info():
+    """hits, misses and size of cache of get_phone_word_tltk"""
+    return _tltk_cache().info()
 
 def get_phone_word_tltk(thaiword:str):
+    # same as _get_phone_word_tltk, but cached
+    cache = _tltk_cache()
+    phone = cache.get(thaiword)
+    if phone is None:
+        phone = _get_phone_word_tltk(thaiword)
+        cache.set(thaiword, phone)
+    return phone
+
+def _get_phone_word_tltk(thaiword:str):
     # if the word is not in dict, use tltk instead
     # tltk may return several sentences e.g. <tr/>paj0|maj4|<s/><tr/>maj2|paj0|<s/>
     # sentences = ['paj0|maj4', 'maj2|paj0']
     decoded_syls = []
     result = tltkg2p(thaiword)
-    tokens = re.findall(r'<tr/>(\S+?)\|(?:<s/>|\s)', result)
-    for token in tokens: # 'paj0|maj4'
+    for token in TLTK_TOKEN_PATTERN.findall(result): # 'paj0|maj4'
         # split to each syllable 'paj0', 'maj4'
         # delimiter : | or ^ or ~ '
-        for syl in re.split(r"[|^~\']", token):
-            syl = syl.replace('\\', '') # remove \ e.g. เจิ้น -> c\\@n2
-            ### change encoding ###
-            tone = str(int(syl[-1])+1) # 0->1 because use 0-4 in tltk
-            if int(tone) > 5: # strangely, there are tone "8" in tltk
-                tone = str(int(tone)-5)
-            syl = syl[:-1] + tone
-            # replace vowels
-            syl = re.sub(r'iia(?=\d)', 'J-', syl) # /ia/
-            syl = re.sub(r'iia', 'J', syl)
-            syl = re.sub(r'ia', 'J-', syl)
-            syl = re.sub(r'UUa(?=\d)', 'W-', syl) # /ɯa/
-            syl = re.sub(r'UUa', 'W', syl)
-            syl = re.sub(r'Ua', 'W-', syl)
-            syl = re.sub(r'uua(?=\d)', 'R-', syl) # /ua/
-            syl = re.sub(r'uua', 'R', syl)
-            syl = re.sub(r'ua', 'R-', syl)
-            syl = re.sub(r'aa(?=\d)', 'A-', syl) # no coda
-            syl = re.sub(r'aa', 'A', syl) # with coda
-            syl = re.sub(r'a(?=\d)', 'a-', syl) # no coda
-            syl = re.sub(r'ii(?=\d)', 'I-', syl)
-            syl = re.sub(r'ii', 'I', syl)
-            syl = re.sub(r'i(?=\d)', 'i-', syl)
-            syl = re.sub(r'UU(?=\d)', 'V-', syl) # /ɯ/
-            syl = re.sub(r'UU', 'V', syl)
-            syl = re.sub(r'U(?=\d)', 'v-', syl)
-            syl = re.sub(r'U', 'v', syl)
-            syl = re.sub(r'uu(?=\d)', 'U-', syl) # /u/
-            syl = re.sub(r'uu', 'U', syl)
-            syl = re.sub(r'u(?=\d)', 'u-', syl)
-            syl = re.sub(r'xx(?=\d)', 'Y-', syl) # /ɛ/
-            syl = re.sub(r'xx', 'Y', syl)
-            syl = re.sub(r'x(?=\d)', 'y-', syl)
-            syl = re.sub(r'x', 'y', syl)
-            syl = re.sub(r'ee(?=\d)', 'E-', syl) # /e/
-            syl = re.sub(r'ee', 'E', syl)
-            syl = re.sub(r'e(?=\d)', 'e-', syl)
-            syl = re.sub(r'OO(?=\d)', 'X-', syl) # /ɔ/
-            syl = re.sub(r'OO', 'X', syl)
-            syl = re.sub(r'O(?=\d)', 'x-', syl)
-            syl = re.sub(r'O', 'x', syl)
-            syl = re.sub(r'oo(?=\d)', 'O-', syl) # /o/
-            syl = re.sub(r'oo', 'O', syl)
-            syl = re.sub(r'o(?=\d)', 'o-', syl)
-            syl = re.sub(r'@@(?=\d)', 'Z-', syl) # /ə/
-            syl = re.sub(r'@@', 'Z', syl)
-            syl = re.sub(r'@(?=\d)', 'z-', syl)
-            syl = re.sub(r'@', 'z', syl)
-            # replace consonants
-            syl = re.sub(r'th', 'T', syl)
-            syl = re.sub(r'kh', 'K', syl)
-            syl = re.sub(r'ph', 'P', syl)
-            syl = re.sub(r'ch', 'C', syl)
-
-            decoded_syls.append(syl)
+        for syl in TLTK_SYLLABLE_DELIMITER.split(token):
+            decoded_syls.append(convert_tltk_syllable(syl))
 
     return ' '.join(decoded_syls)
 
@@ -272,37 +431,151 @@ def decode(phone, transcription='haas', keep_space=True):
     else:
         raise TypeError
 
-    decoded_syls = []
-    for i, syl in enumerate(syls):
-        if not validate(syl): # e.g. English, punctuation
-            decoded_syls.append(syl) # return original string
-            continue
-        tone = syl[-1]
-        coda = syl[-2]
-        coda = coda.replace('ʔ','-') # delete ? in all codas
-        """ # delete ? unless the final syllable
-        if i != len(syls) - 1: 
-            coda = coda.replace('ʔ','-') # "-" = no coda
-        """
-        vowel = syl[-3]
-        onset = syl[:-3] # one or two characters
-        if transcription.lower() == 'ipa':
-            decoded_syls.append(''.join([PHONE2IPA[c] for c in onset]) + PHONE2IPA[vowel+tone] + PHONE2IPA[coda])
-        elif transcription.lower() == 'haas':
-            decoded_syls.append(''.join([PHONE2HAAS[c] for c in onset]) + PHONE2HAAS[vowel+tone] + PHONE2HAAS[coda])
-        elif transcription.lower() == 'rtgs':
-            decoded_syls.append(''.join([PHONE2RTGS[c] for c in onset]) + PHONE2RTGS[vowel+tone] + PHONE2RTGS_CODA[coda])
+    table = get_syllable_table(transcription)
+    if table is None: # unknown transcription, only undecodable syllables are kept
+        decoded_syls = [syl for syl in syls if not validate(syl)]
+    else: # e.g. English, punctuation -> return original string
+        decoded_syls = [table.get(syl, syl) for syl in syls]
+    return _join_syllables(decoded_syls, keep_space)
+
+def decode_many(phones, transcription='haas', keep_space=True):
+    """decode list of phones at once, same as [decode(p) for p in phones]
+
+    Example
+    -------
+        decode_many(['kot2 mAj5', 'paj1'], 'ipa')
+            ['kòtmǎːj', 'paj']
+    """
+    table = get_syllable_table(transcription)
+    if table is None:
+        return [decode(phone, transcription, keep_space) for phone in phones]
+    get = table.get
+    return [_join_syllables([get(syl, syl) for syl in (phone.split() if type(phone) == str else phone)], keep_space)
+        for phone in phones]
+
+def _join_syllables(decoded_syls, keep_space):
     if keep_space == False:
-        decoded_syls = ''.join(decoded_syls)
+        return ''.join(decoded_syls)
     elif type(keep_space) == str: # custom delimiter
-        decoded_syls = keep_space.join(decoded_syls)
+        return keep_space.join(decoded_syls)
     else:
-        decoded_syls = ''.join(decoded_syls)
-    return decoded_syls
+        return ''.join(decoded_syls)
+
+def render_syllable(syl, transcription='haas'):
+    """decode one valid syllable, e.g. render_syllable('kot2') -> kòt"""
+    tone = syl[-1]
+    coda = syl[-2]
+    coda = coda.replace('ʔ','-') # delete ? in all codas
+    vowel = syl[-3]
+    onset = syl[:-3] # one or two characters
+    if transcription.lower() == 'ipa':
+        return ''.join([PHONE2IPA[c] for c in onset]) + PHONE2IPA[vowel+tone] + PHONE2IPA[coda]
+    elif transcription.lower() == 'haas':
+        return ''.join([PHONE2HAAS[c] for c in onset]) + PHONE2HAAS[vowel+tone] + PHONE2HAAS[coda]
+    elif transcription.lower() == 'rtgs':
+        return ''.join([PHONE2RTGS[c] for c in onset]) + PHONE2RTGS[vowel+tone] + PHONE2RTGS_CODA[coda]
+
+### {encoded syllable: decoded syllable} of all valid syllables, built on first use
+### onsets x vowels x codas x tones = 38 x 21 x 15 x 5 syllables
+_SYLLABLE_TABLES = {}
+
+def get_syllable_table(transcription='haas'):
+    """table of decoded syllables, None if transcription is unknown"""
+    transcription = transcription.lower()
+    table = _SYLLABLE_TABLES.get(transcription)
+    if table is None and transcription in ('ipa', 'haas', 'rtgs'):
+        table = {}
+        for onset, vowel, coda, tone in itertools.product(CLUSTERS+ONSETS, VOWELS, CODAS, '12345'):
+            syl = onset + vowel + coda + tone
+            table[syl] = render_syllable(syl, transcription)
+        _SYLLABLE_TABLES[transcription] = table
+    return table
+
+### optional cache of whole g2p results, for repeated sentences
+_SENTENCE_CACHE = None
+# incremented when the lexicon changes. g2p started before the change may finish after
+# the cache is cleared, its result is not cached if the generation is not the same
+_LEXICON_GENERATION = 0
+_CACHE_LOCK = threading.Lock() # generation check & cache set / increment & clear at once
+
+def configure_sentence_cache(maxsize=10000, max_bytes=64*1024*1024):
+    """cache results of g2p() for str input, keyed by cleaned text and options
+
+    Parameters
+    ----------
+    maxsize : int
+        max number of sentences, 0 or None disables the cache
+    max_bytes : int
+        max approximate memory of cached keys and results
+
+    Return
+    ------
+    SentenceCache or None
+    """
+    global _SENTENCE_CACHE
+    _SENTENCE_CACHE = SentenceCache(maxsize, max_bytes) if maxsize else None
+    return _SENTENCE_CACHE
+
+def _invalidate_results():
+    # results of the old lexicon
+    global _LEXICON_GENERATION
+    with _CACHE_LOCK:
+        _LEXICON_GENERATION += 1
+        if _SENTENCE_CACHE is not None:
+            _SENTENCE_CACHE.clear()
+
+def _cache_result(cache_key, result, generation):
+    with _CACHE_LOCK:
+        if generation == _LEXICON_GENERATION and _SENTENCE_CACHE is not None:
+            _SENTENCE_CACHE.set(cache_key, result)
+
+def sentence_cache_info():
+    """hits, misses, size and bytes of cache of g2p, None if disabled"""
+    return None if _SENTENCE_CACHE is None else _SENTENCE_CACHE.info()
+
+class Token:
+    """one token of g2p(..., return_tokens='records')
+
+    Attributes
+    ----------
+    token : str
+        token, merged tokens are joined by a space e.g. 'เด็ก ๆ', '8.30 น.'
+    phone : str
+        encoded phone e.g. 'dek2 dek2'
+    decoded : str or None
+        decoded phone, None if decoded=False
+    branch : str
+        where the phone comes from, 'lexicon', 'tltk', 'time', 'number' or 'passthrough'
+    start, end : int or None
+        position in the cleaned sentence, None if input is a list of tokens
+    """
+
+    __slots__ = ('token', 'phone', 'decoded', 'branch', 'start', 'end')
+
+    def __init__(self, token, phone, branch, start=None, end=None, decoded=None):
+        self.token = token
+        self.phone = phone
+        self.decoded = decoded
+        self.branch = branch
+        self.start = start
+        self.end = end
+
+    # t[0], t[1] are token and phone, like [token, phone] of return_tokens=True
+    def __getitem__(self, i):
+        return getattr(self, self.__slots__[i])
+
+    def __setitem__(self, i, value):
+        setattr(self, self.__slots__[i], value)
+
+    def __repr__(self):
+        return f'Token({self.token!r}, {self.phone!r}, {self.decoded!r}, {self.branch!r}, {self.start}, {self.end})'
+
+    def __eq__(self, other):
+        return isinstance(other, Token) and all(getattr(self, k) == getattr(other, k) for k in self.__slots__)
 
 # tokenize by pythainlp -> look up dictionary
 # if there is none, try to use tltk instead
-def g2p(sentence, transcription='haas', return_tokens=False, decoded=True):
+def g2p(sentence, transcription='haas', return_tokens=False, decoded=True, tokenizer='pythainlp', stats=None):
     """G2P function for Thai sentence
 
     Parameters
@@ -311,18 +584,26 @@ def g2p(sentence, transcription='haas', return_tokens=False, decoded=True):
         string of Thai sentences or list of tokenized words 
     transcription : str
         'haas'(default) or 'ipa' or 'rtgs'
-    return_tokens : bool
+    return_tokens : bool or str
         whether returns also tokenized sentence
+        if 'records', returns list of Token (token, phone, decoded, branch, start, end)
+        (records are not kept in the sentence cache)
     decoded : bool
         if True, returns decoded phone e.g. paj roːŋ rian
         if False, returns undecoded phone e.g. paj1 rON1 rJn1
+    tokenizer : str
+        'pythainlp'(default) or 'lexicon'
+        'lexicon' segments by words of THAI2PHONE_DICT and finds their phones at once,
+        pythainlp is not used
+    stats : G2PStats
+        if given, time of each stage and counts of tokens are added to it (see thaig2p.stats)
 
     Return
     ------
     str
         syllables delimited by whitespaces 
     or list
-        list of [token, phone]
+        list of [token, phone] (or Token)
 
     Examples
     --------
@@ -334,67 +615,164 @@ def g2p(sentence, transcription='haas', return_tokens=False, decoded=True):
 
         g2p('ไปโรงเรียน', return_tokens=True)
             [['ไป', 'pay'], ['โรงเรียน', 'rooŋ rian']]
+
+        g2p('ไปโรงเรียน', return_tokens='records')
+            [Token('ไป', 'paj1', 'pay', 'lexicon', 0, 2), Token('โรงเรียน', 'rON1 rJn1', 'rooŋrian', 'lexicon', 2, 10)]
     """
 
+    record = None if stats is None else stats.start()
+    cache_key = None
+    generation = _LEXICON_GENERATION # before the lexicon is read
+
     ### tokenize ###
+    thai2phone = _thai2phone_dict()
+    # compiled lexicon with pre-rendered phones -> (phone, decoded phone) of words by one search
+    render = getattr(thai2phone, 'renderer', None)
+    render = render(transcription) if decoded and render is not None else None
     if type(sentence) == str: # input is string
         sentence = clean(sentence) # preprocessing
-        tokens = word_tokenize(sentence, keep_whitespace=False)
+        if record is not None:
+            record.lap('clean')
+        if _SENTENCE_CACHE is not None and return_tokens != 'records': # same sentence & options -> same result
+            cache_key = (sentence, transcription, return_tokens, decoded, tokenizer)
+            result = _SENTENCE_CACHE.get(cache_key)
+            if result is not None:
+                if record is not None:
+                    stats.add(record)
+                return result
+        if tokenizer == 'lexicon': # phones of words in dictionary are found here
+            token_phones = _tokenize_lexicon(sentence, thai2phone, _lexicon_trie(), render)
+        else:
+            token_phones = zip(word_tokenize(sentence, keep_whitespace=False), itertools.repeat(None))
     elif type(sentence) == list and type(sentence[0]) == str: # input is tokens already
-        tokens = sentence
+        token_phones = zip(sentence, itertools.repeat(None))
+    if record is not None:
+        token_phones = list(token_phones) # tokenize now to measure
+        record.lap('tokenize')
     
-    token_phone_list = [] # list of [token, phone] e.g. [['ไป','paj1'],['โรงเรียน','rON1 rJn1']]
+    records = return_tokens == 'records'
+    # Token records, or [token, phone, decoded phone] (cheaper when offsets are not needed)
+    # both are built once and completed in place
+    tokens = []
+    text = sentence if records and type(sentence) == str else None # for offsets
+    cursor = 0
 
     ### check each token ###
-    for i, token in enumerate(tokens):
+    for i, (token, phone) in enumerate(token_phones):
+        rendered = None
+        if text is None:
+            start = end = None
+        else: # position in cleaned text, tokens are in order
+            start = text.find(token, cursor)
+            if start < 0:
+                start = end = None
+            else:
+                end = cursor = start + len(token)
 
         # exceptions
 
         if token == 'น.' and i > 0 and\
-        (token_phone_list[-1][1].endswith('nA-1 li-4 kA-1') or token_phone_list[-1][1].endswith('nA-1 TI-1')):
-            token_phone_list[-1][0] += ' น.' # add to previous token to avoid duplicate
+        (tokens[-1][1].endswith('nA-1 li-4 kA-1') or tokens[-1][1].endswith('nA-1 TI-1')):
+            last = tokens[-1]
+            last[0] += ' น.' # add to previous token to avoid duplicate
+            if records:
+                last.end = end
+            if record is not None:
+                record.count('merge')
             continue
         elif token == 'ๆ' and i > 0: # if single ๆ, repeat final one
-            token_phone_list[-1][0] += ' ๆ'
-            token_phone_list[-1][1] += ' ' + token_phone_list[-1][1]
+            last = tokens[-1]
+            last[0] += ' ๆ'
+            last[1] += ' ' + last[1]
+            if last[2] is not None:
+                last[2] *= 2 # decoded syllables are joined without space
+            if records:
+                last.end = end
+            if record is not None:
+                record.count('repeat')
             continue
         
+        # Thai word found by lexicon tokenizer
+        elif phone is not None:
+            if render is not None:
+                phone, rendered = phone
+            branch = 'lexicon'
+
         # Thai word in dictionary
-        elif token in THAI2PHONE_DICT:
-            phone = get_phone_word(token)
+        elif token in thai2phone:
+            if render is None:
+                phone = get_phone_word(token)
+            else:
+                phone, rendered = render(token)
+            branch = 'lexicon'
 
         # single thai character (maybe mistake of tokenization) -> pass
         elif re.match('[ก-ฮ]$', token): 
+            if record is not None:
+                record.count('skip')
             continue
 
         # thaiword, but not in dictionary -> use tltk instead
         elif re.match(r'[ก-๙][ก-๙\-\.]*$', token): 
             #phone = None  # return None, USE THIS LINE WHEN TEST
-            phone = get_phone_word_tltk(token)
+            if record is None:
+                phone = get_phone_word_tltk(token)
+            else:
+                record.lap('lookup')
+                phone = get_phone_word_tltk(token)
+                record.tltk_seconds.append(record.lap('tltk'))
+            branch = 'tltk'
         
         # time e.g. 22.34 
         elif is_time(token):
             phone = get_phone_time(token)
+            branch = 'time'
         
         # number
         elif is_number(token):
             phone = get_phone_number(token)
+            branch = 'number'
         
         # return original token, e.g. english, punctuation...
         else: 
             phone = token
+            branch = 'passthrough'
 
-        token_phone_list.append([token, phone])
+        if records:
+            tokens.append(Token(token, phone, branch, start, end, rendered or None)) # '' = not pre-rendered
+        else:
+            tokens.append([token, phone, rendered or None])
+        if record is not None:
+            record.count(branch)
+
+    if record is not None:
+        record.lap('lookup')
 
     ### decode ###
-    if decoded:
-        token_phone_list = [[t, decode(p, transcription)] for t, p in token_phone_list]
+    # words in pre-rendered lexicon are already decoded
+    if records:
+        if decoded:
+            for t in tokens:
+                if t.decoded is None:
+                    t.decoded = decode(t.phone, transcription)
+    elif decoded:
+        phones = [rendered or decode(phone, transcription) for _, phone, rendered in tokens]
+    else:
+        phones = [phone for _, phone, _ in tokens]
+    if record is not None:
+        record.lap('decode')
+        stats.add(record)
 
     ### return ###
-    if return_tokens:
-        return token_phone_list # return as list of [token, phone]
+    if records:
+        return tokens
+    elif return_tokens: # list of [token, phone]
+        result = [[t[0], phone] for t, phone in zip(tokens, phones)]
     else:
-        return ' '.join([phone for _, phone in token_phone_list])
+        result = ' '.join(phones)
+    if cache_key is not None:
+        _cache_result(cache_key, result, generation)
+    return result
 
 def encode_haas(phone_haas):
     syls = phone_haas.split(' ')
@@ -423,7 +801,6 @@ def encode_haas(phone_haas):
 
         # vowel
         if syl not in HAAS2PHONE:
-            print(coda, onset, syl)
             return None
         vowel, tone = HAAS2PHONE[syl]
 
@@ -432,6 +809,121 @@ def encode_haas(phone_haas):
     return ' '.join(encoded_syls)
 
 
+##################################################
+### BATCH PROCESSING
+##################################################
+
+def _iter_chunks(iterable, chunksize):
+    # split any iterable into lists of `chunksize` items without reading it all
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+def _g2p_chunk(sentences, kwargs, stats=False):
+    # run in worker processes (or threads), dictionaries are loaded once by warmup() at worker start
+    # with stats, statistics of the chunk are returned together to be merged
+    if not stats:
+        return [g2p(sentence, **kwargs) for sentence in sentences]
+    chunk_stats = G2PStats()
+    return [g2p(sentence, stats=chunk_stats, **kwargs) for sentence in sentences], chunk_stats
+
+def _map_ordered(executor, func, chunks, window):
+    # submit at most `window` chunks ahead, yield result of each chunk in input order
+    pending = collections.deque()
+    for chunk in chunks:
+        pending.append(executor.submit(func, chunk))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def g2p_batch(sentences, transcription='haas', return_tokens=False, decoded=True, tokenizer='pythainlp',
+        workers=None, chunksize=64, lazy=False, stats=None):
+    """G2P function for many sentences using a process pool
+
+    Parameters
+    ----------
+    sentences : iterable
+        iterable of str (or list of tokenized words), can be a generator
+    transcription, return_tokens, decoded, tokenizer :
+        same as g2p()
+    workers : int
+        number of worker processes, default is os.cpu_count()
+        if 1, run in the current process without a pool
+    chunksize : int
+        number of sentences sent to a worker at once
+    lazy : bool
+        if True, returns an iterator which yields results in input order
+        only a few chunks per worker are in flight, so memory stays bounded
+    stats : G2PStats
+        same as g2p(), statistics of worker processes are merged into it
+
+    Return
+    ------
+    list or iterator
+        results of g2p() for each sentence, in the same order as input
+
+    Example
+    -------
+        g2p_batch(['ไปโรงเรียน', 'หิวข้าว'], workers=2)
+            ['pay rooŋrian', 'hǐwkhâaw']
+    """
+    kwargs = {'transcription':transcription, 'return_tokens':return_tokens, 'decoded':decoded, 'tokenizer':tokenizer}
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = (g2p(sentence, stats=stats, **kwargs) for sentence in sentences)
+    else:
+        results = _g2p_batch_pool(sentences, kwargs, workers, chunksize, stats)
+    return results if lazy else list(results)
+
+def _g2p_batch_pool(sentences, kwargs, workers, chunksize, stats=None):
+    with ProcessPoolExecutor(max_workers=workers, initializer=warmup) as executor:
+        yield from _g2p_pool(executor, sentences, kwargs, workers, chunksize, stats)
+
+def _g2p_pool(executor, sentences, kwargs, workers, chunksize, stats=None):
+    # chunks run in executor, results are yielded in input order
+    func = partial(_g2p_chunk, kwargs=kwargs, stats=stats is not None)
+    for results in _map_ordered(executor, func, _iter_chunks(sentences, chunksize), window=workers*2):
+        if stats is not None:
+            results, chunk_stats = results
+            stats.merge(chunk_stats)
+        yield from results
+
+def g2p_many(sentences, transcription='haas', return_tokens=False, decoded=True, tokenizer='pythainlp',
+        workers=None, chunksize=64, lazy=False, stats=None):
+    """G2P function for many sentences using a thread pool, same as g2p_batch() except threads
+
+    threads share the dictionaries and caches of this process, nothing is copied or pickled.
+    with the GIL, threads run Python code one at a time, so use this for small batches
+    or on free-threaded builds of Python (3.13t), where chunks run in parallel.
+    conversion by tltk is serialized in any case (tltk is not thread-safe)
+
+    Parameters
+    ----------
+    same as g2p_batch(), workers is number of threads
+
+    Example
+    -------
+        g2p_many(['ไปโรงเรียน', 'หิวข้าว'], workers=4)
+            ['pay rooŋrian', 'hǐwkhâaw']
+    """
+    kwargs = {'transcription':transcription, 'return_tokens':return_tokens, 'decoded':decoded, 'tokenizer':tokenizer}
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = (g2p(sentence, stats=stats, **kwargs) for sentence in sentences)
+    else:
+        results = _g2p_many_pool(sentences, kwargs, workers, chunksize, stats)
+    return results if lazy else list(results)
+
+def _g2p_many_pool(sentences, kwargs, workers, chunksize, stats=None):
+    warmup() # load everything once here, not by the first chunk of each thread
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thaig2p') as executor:
+        yield from _g2p_pool(executor, sentences, kwargs, workers, chunksize, stats)
+
+
 PHONE2IPA = {
     'a1':'a' ,'a2':'à' ,'a3':'â' ,'a4':'á' ,'a5':'ǎ' ,
     'A1':'aː','A2':'àː','A3':'âː','A4':'áː','A5':'ǎː',
@@ -0,0 +1,140 @@
+import re, html
+
+##################################################
+### TEXT NORMALIZATION
+##################################################
+
+# clean() in fewer passes, the result is the same as the original chain of re.sub
+#   html.unescape -> shrink whitespaces -> remove URL -> space around ( ) and " "
+#   -> unify quotations -> shrink spaces -> remove \r, zero width space, BOM -> strip
+# - all whitespaces are already ' ' after the 1st pass, so shrinking spaces is just ' {2,}'
+# - quotations are unified after spacing " ", since “ ” must not be paired there
+# - replacements of single characters are done by one str.translate, but only when
+#   one of them is in the text (translate is slow for non-ASCII text)
+# - passes are skipped when their trigger character is not in the text
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+URL_PATTERN = re.compile(r'https?://\S+')
+PAREN_PATTERN = re.compile(r'\((.+?)\)')
+QUOTE_PATTERN = re.compile(r'"(.+?)"')
+SPACES_PATTERN = re.compile(r' {2,}')
+TRANSLATE_TABLE = str.maketrans({
+    '“':'"', '”':'"', '„':'"', # double quotations -> "
+    '‘':"'", '’':"'", '`':"'", # single quotations -> '
+    '\r':None, '\u200b':None, '\ufeff':None, # removed (zero width space, BOM)
+})
+TRANSLATE_PATTERN = re.compile('[' + ''.join(chr(c) for c in TRANSLATE_TABLE) + ']')
+
+def clean(text:str):
+    """normalize text before tokenization
+    >>> clean('ไป  (โรงเรียน)') -> 'ไป ( โรงเรียน )'
+    """
+    if '&' in text:
+        text = html.unescape(text)
+    text = WHITESPACE_PATTERN.sub(' ', text) # shrink whitespaces
+    return _finish(_quote(_paren(_remove_url(text)))).strip()
+
+def _remove_url(text):
+    return URL_PATTERN.sub('', text) if 'http' in text else text
+
+def _paren(text):
+    # add space before/after parentheses
+    return PAREN_PATTERN.sub(r'( \1 )', text) if '(' in text else text
+
+def _quote(text):
+    # add space before/after quotation
+    return QUOTE_PATTERN.sub(r'" \1 "', text) if '"' in text else text
+
+def _finish(text):
+    # e.g. good  boy -> good boy, then convert quotations and remove invisible characters
+    if '  ' in text:
+        text = SPACES_PATTERN.sub(' ', text)
+    if TRANSLATE_PATTERN.search(text):
+        text = text.translate(TRANSLATE_TABLE)
+    return text
+
+### streaming
+
+def clean_stream(chunks):
+    """clean() for text given as chunks, e.g. a large file read by blocks
+
+    yields cleaned pieces, ''.join(clean_stream(chunks)) == clean(''.join(chunks)).
+    only a small tail of the text is kept in memory, except the text after
+    ( or " which is not closed yet (it is kept until closed or the end of input)
+
+    Example
+    -------
+        with open('large.txt') as f:
+            for piece in clean_stream(iter(lambda: f.read(1 << 20), '')):
+                out.write(piece)
+    """
+    pieces = _stream_pairs(_stream_pairs(_stream_whitespace(chunks), PAREN_PATTERN, '(', ')', r'( \1 )'),
+        QUOTE_PATTERN, '"', '"', r'" \1 "')
+    yield from _stream_finish(pieces)
+
+def _stream_whitespace(chunks):
+    # html.unescape, shrink whitespaces and remove URL
+    # text is cut at ' ' or '\n', which never appear in html entities and URLs
+    rest = ''
+    space = False # whether the previous piece ended with whitespace
+    for chunk in chunks:
+        rest += chunk
+        cut = max(rest.rfind(' '), rest.rfind('\n'))
+        if cut <= 0:
+            continue
+        text, rest = rest[:cut], rest[cut:]
+        text, space = _shrink_whitespace(text, space)
+        yield _remove_url(text)
+    if rest:
+        text, space = _shrink_whitespace(rest, space)
+        yield _remove_url(text)
+
+def _shrink_whitespace(text, space):
+    if '&' in text:
+        text = html.unescape(text)
+    text = WHITESPACE_PATTERN.sub(' ', text)
+    if space and text.startswith(' '): # whitespaces across pieces are one space
+        text = text[1:]
+    return text, text.endswith(' ') or (space and not text)
+
+def _stream_pairs(pieces, pattern, opening, closing, replacement):
+    # pattern.sub for paired characters, text after an unpaired opening character is kept
+    # until the closing one comes, because the match depends on the following text
+    rest = ''
+    for piece in pieces:
+        if rest and closing not in piece: # still not closed, skip searching again
+            rest += piece
+            continue
+        rest += piece
+        end = 0
+        for match in pattern.finditer(rest):
+            end = match.end()
+        unpaired = rest.find(opening, end)
+        cut = len(rest) if unpaired == -1 else unpaired
+        if cut:
+            yield pattern.sub(replacement, rest[:cut])
+            rest = rest[cut:]
+    if rest:
+        yield pattern.sub(replacement, rest)
+
+def _stream_finish(pieces):
+    # _finish() and strip(), spaces at the end of each piece are kept until the next piece,
+    # to be shrunk together or stripped at the end of text
+    rest = ''
+    started = False # whether any non-space character has been yielded
+    pending = '' # spaces already finished but not yielded yet
+    for piece in pieces:
+        text = rest + piece
+        body = text.rstrip(' ')
+        rest = text[len(body):]
+        text = _finish(body)
+        stripped = text.strip(' ')
+        if not stripped:
+            pending += text
+            continue
+        if started:
+            yield pending + text.rstrip(' ')
+        else:
+            yield stripped
+            started = True
+        pending = text[len(text.rstrip(' ')):]
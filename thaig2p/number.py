@@ -0,0 +1,213 @@
+import os, re, csv, threading
+from functools import lru_cache
+
+##################################################
+### NUMBERS
+##################################################
+
+# numbers, times, dates, ordinals, money and ranges -> encoded phones
+#
+#   get_phone_number('3,120')    -> 'sAm5 Pan1 rXj4 jI-3 sip2'
+#   verbalize('12/05/2567')      -> 'sip2 sXN5 Prvt4 sa-1 PA-1 Kom1 sXN5 Pan1 hA-3 rXj4 hok2 sip2 cet2'
+#   verbalize('฿1,250.50')       -> 'nvN2 Pan1 sXN5 rXj4 hA-3 sip2 bAt2 hA-3 sip2 sa-1 tAN1'
+#   verbalize('10-20')           -> 'sip2 TvN5 jI-3 sip2'
+#   verbalize_many(cells)        -> same for many texts, e.g. cells of a table
+#
+# integers are read by groups of 6 digits from the right, joined by lAn4 (ล้าน)
+# e.g. 10^12 -> nvN2 lAn4 lAn4, without recursion. phones of groups are cached,
+# so numbers of a feed or a table cost a few lookups.
+# up to 12 digits, results are the same as the original recursive get_phone_number
+
+abs_dir = os.path.dirname(__file__)
+_NUMBER2PHONE_DICT = None
+_LOAD_LOCK = threading.Lock()
+
+def _number2phone_dict():
+    global _NUMBER2PHONE_DICT
+    if _NUMBER2PHONE_DICT is None:
+        with _LOAD_LOCK:
+            if _NUMBER2PHONE_DICT is None:
+                with open(abs_dir + '/number2phone.csv') as f:
+                    _NUMBER2PHONE_DICT = dict(csv.reader(f))
+    return _NUMBER2PHONE_DICT
+
+TIME_PATTERN = re.compile(r'[012]?[0-9][:\.][0-5][0-9](\s*)?(น.)?')
+TIME_SEPARATOR = re.compile(r'[:\.]')
+NUMBER_PATTERN = re.compile(r'\-?\d[\d\,]*(?:\.\d+)?$')
+LEADING_ZEROS = re.compile(r'0[0-9]*[1-9]+') # e.g. 0012 (exclude 0, 00)
+
+# patterns of verbalize(), whole text must match
+DATE_PATTERN = re.compile(r'(\d{1,2})[/\-\.](\d{1,2})[/\-\.](\d{2,4})$') # 12/05/2567
+ISO_DATE_PATTERN = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})$') # 2024-05-12
+MONEY_PATTERN = re.compile(r'(฿\s*)?(\-?\d[\d,]*)(?:\.(\d{1,2}))?\s*(บาท)?$') # ฿1,250.50, 20 บาท
+ORDINAL_PATTERN = re.compile(r'ที่\s*(\d[\d,]*)$') # ที่ 3
+RANGE_PATTERN = re.compile(r'(\S+?)\s*[\-–]\s*(\S+)$') # 10-20, 8.00-9.30
+TIME_FULL_PATTERN = re.compile(r'[012]?[0-9][:\.][0-5][0-9]\s*(?:น\.)?$')
+
+ZERO = 'sUn5'
+LAN = 'lAn4' # ล้าน, 10^6
+POINT = 'cut2' # จุด
+MINUS = 'lop4' # ลบ
+ORDINAL = 'TI-3' # ที่
+TO = 'TvN5' # ถึง
+BAHT = 'bAt2' # บาท
+SATANG = 'sa-1 tAN1' # สตางค์
+HOUR = 'nA-1 li-4 kA-1' # นาฬิกา
+MINUTE = 'nA-1 TI-1' # นาที
+MONTHS = [ # มกราคม ... ธันวาคม, same as thai2phone.csv
+    'mok4 ka-2 rA-1 Kom1', 'kum1 PA-1 Pan1', 'mI-1 nA-1 Kom1', 'mE-1 sA-5 jon1',
+    'Prvt4 sa-1 PA-1 Kom1', 'mi?4 Tu?2 nA-1 jon1', 'ka-2 ra-4 ka-2 dA-1 Kom1', 'siN5 hA-5 Kom1',
+    'kan1 jA-1 jon1', 'tu?2 lA-1 Kom1', 'Prvt4 sa-1 ci?2 kA-1 jon1', 'Tan1 wA-1 Kom1',
+]
+
+### integers
+
+@lru_cache(maxsize=100000)
+def _group_phone(digits):
+    # phone of up to 6 digits, may start with 0 (lower groups of long numbers)
+    # 345 -> 300 + 45, the same rule as the original recursive code
+    number2phone = _number2phone_dict()
+    phones = []
+    while True:
+        if LEADING_ZEROS.match(digits):
+            digits = digits.lstrip('0') # 0012 -> 12
+        if digits in number2phone:
+            phones.append(number2phone[digits])
+            break
+        if len(digits) <= 2: # 34 -> 30 + 4
+            phones += [number2phone[digits[0]+'0'], number2phone[digits[1]]]
+            break
+        phones.append(number2phone[digits[0] + '0'*(len(digits)-1)]) # 345 -> 300, then 45
+        digits = digits[1:]
+    return ' '.join(phones)
+
+def _integer_phone(digits):
+    # digits of any length (no sign, no comma)
+    if not digits.strip('0'): # 0, 00, 000 -> digit by digit
+        return ' '.join([ZERO] * len(digits))
+    digits = digits.lstrip('0')
+    head = len(digits) % 6 or 6
+    phones = [_group_phone(digits[:head])]
+    for i in range(head, len(digits), 6): # each 6 digits = ล้าน
+        group = digits[i:i+6]
+        phones.append(LAN)
+        if group != '000000':
+            phones.append(_group_phone(group))
+    return ' '.join(phones)
+
+def is_number(text:str):
+    return NUMBER_PATTERN.match(text) is not None
+
+def get_phone_number(number:str):
+    # 3,120 -> sAm5 Pan1 rXj4 jI-3 sip2
+    # 123.123 -> nɯŋ2 rXj4 jI-3 sip2 sAm5 cut2 nɯŋ2 sXŋ5 sAm5
+    number = str(number).replace(',', '') # float 123.5 -> str "123.5", 1,000 -> 1000
+    minus = number[0] == '-' # bool to check negative
+    number = number.strip('-') # delete initial -
+    if '.' not in number: # if integer
+        phone = _integer_phone(number)
+    else: # if decimal, digits after the point are read one by one
+        integer, decimal = number.split('.')
+        number2phone = _number2phone_dict()
+        phone = _integer_phone(integer) + ' ' + POINT + ' ' + ' '.join([number2phone[x] for x in decimal])
+    if minus:
+        return MINUS + ' ' + phone
+    else:
+        return phone
+
+### time
+
+def is_time(text:str):
+    # 8:00, 09.12, 12:12, 23.31น., etc
+    return TIME_PATTERN.match(text) is not None
+
+def get_phone_time(time:str):
+    # 20.31 -> jI-3 sip2 nA-1 liʔ4 kA-1 sAm5 sip2 ʔet2 nA-1 TI-1
+    hour, minute = TIME_SEPARATOR.split(time, 1) # 23.31น. -> [23, 31น.]
+    minute = minute.split('น.')[0].strip() # 31น. -> 31
+    if minute == '00':
+        return get_phone_number(hour) + ' ' + HOUR # 8.00 -> pYt2 nA-1 li-4 kA-1
+    else:
+        return get_phone_number(hour) + ' ' + HOUR + ' ' + get_phone_number(minute) + ' ' + MINUTE
+
+### dates, ordinals, money, ranges
+
+def get_phone_date(day, month, year):
+    """day month year, e.g. (12, 5, 2567) -> sip2 sXN5 Prvt4 sa-1 PA-1 Kom1 sXN5 Pan1 ...
+    year is read as it is (no conversion between B.E. and A.D.)
+    """
+    day, month = int(day), int(month)
+    if not (1 <= day <= 31 and 1 <= month <= 12):
+        raise ValueError(f'invalid date: {day}/{month}/{year}')
+    return ' '.join([_integer_phone(str(day)), MONTHS[month-1], _integer_phone(str(year))])
+
+def get_phone_ordinal(number):
+    # 3 -> TI-3 sAm5 (ที่สาม)
+    return ORDINAL + ' ' + get_phone_number(number)
+
+def get_phone_money(amount):
+    """Thai baht, satang are read as a number, e.g. 1,250.50 -> ... bAt2 hA-3 sip2 sa-1 tAN1"""
+    amount = str(amount).replace(',', '')
+    baht, _, satang = amount.partition('.')
+    phone = get_phone_number(baht) + ' ' + BAHT
+    satang = satang[:2].ljust(2, '0')
+    if satang.strip('0'):
+        phone += ' ' + _integer_phone(satang) + ' ' + SATANG
+    return phone
+
+def get_phone_range(start, end):
+    # 10, 20 -> sip2 TvN5 jI-3 sip2 (สิบถึงยี่สิบ), times are also accepted
+    return _number_or_time(start) + ' ' + TO + ' ' + _number_or_time(end)
+
+def _number_or_time(text):
+    if TIME_FULL_PATTERN.match(text):
+        return get_phone_time(text)
+    return get_phone_number(text)
+
+def verbalize(text:str):
+    """encoded phone of numeric text, or None if text is not one of
+    date (12/05/2567, 2024-05-12), money (฿1,250.50, 20 บาท), ordinal (ที่ 3),
+    range (10-20, 8.00-9.30), time (8.30, 8.30 น.) or number (-1,234.5)
+
+    Example
+    -------
+        verbalize('ที่ 3')
+            'TI-3 sAm5'
+    """
+    text = text.strip()
+    match = DATE_PATTERN.match(text)
+    if match:
+        day, month, year = match.groups()
+        if 1 <= int(day) <= 31 and 1 <= int(month) <= 12:
+            return get_phone_date(day, month, year)
+    match = ISO_DATE_PATTERN.match(text)
+    if match:
+        year, month, day = match.groups()
+        if 1 <= int(day) <= 31 and 1 <= int(month) <= 12:
+            return get_phone_date(day, month, year)
+    match = MONEY_PATTERN.match(text)
+    if match and (match.group(1) or match.group(4)): # ฿ or บาท
+        amount = match.group(2) + ('.' + match.group(3) if match.group(3) else '')
+        return get_phone_money(amount)
+    match = ORDINAL_PATTERN.match(text)
+    if match:
+        return get_phone_ordinal(match.group(1))
+    match = RANGE_PATTERN.match(text)
+    if match and all(TIME_FULL_PATTERN.match(x) or NUMBER_PATTERN.match(x) for x in match.groups()):
+        return get_phone_range(*match.groups())
+    if TIME_FULL_PATTERN.match(text):
+        return get_phone_time(text)
+    if NUMBER_PATTERN.match(text):
+        return get_phone_number(text)
+    return None
+
+def verbalize_many(texts):
+    """verbalize() of many texts, each distinct text is converted once
+
+    Example
+    -------
+        verbalize_many(['10', '฿20', '10'])
+            ['sip2', 'jI-3 sip2 bAt2', 'sip2']
+    """
+    results = {}
+    return [results[text] if text in results else results.setdefault(text, verbalize(text)) for text in texts]
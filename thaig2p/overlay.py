@@ -0,0 +1,232 @@
+import os, csv, threading
+from collections.abc import Mapping
+from thaig2p.main import validate
+
+##################################################
+### USER LEXICON
+##################################################
+
+# user dictionaries on top of THAI2PHONE_DICT, e.g. brand names, place names
+#
+#   thaig2p.add_user_dict({'ไลน์แมน':'lAj1 mEn1'}, name='brands')
+#   watcher = thaig2p.watch_user_dict('brands.csv') # reloaded when the file changes
+#
+# layers are applied in order of registration, later layers win.
+# all user entries are merged into one dict, which is replaced by a new dict at each update,
+# so g2p running in other threads sees either the old or the new entries, never half of them.
+# only the changed words are applied to the trie of tokenizer='lexicon' and listeners
+# (with tokenizer='pythainlp', user words are used only when pythainlp returns them as tokens)
+
+
+class LayeredLexicon(Mapping):
+    """read-only view of {Thai word: phone}, user layers first, then the base lexicon
+
+    Parameters
+    ----------
+    base : Mapping
+        built-in dictionary, dict or thaig2p.lexicon.Lexicon
+
+    Example
+    -------
+        lexicon = LayeredLexicon({'ไป':'paj1'})
+        lexicon.set_layer('user', {'ไลน์':'lAj1'})
+        lexicon['ไลน์'], lexicon['ไป']
+            ('lAj1', 'paj1')
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.layers = {} # name -> {word: phone}
+        self._overlay = {} # merged layers, replaced (not modified) at each update
+        self._listeners = []
+        self._lock = threading.Lock() # for writers only
+
+    ### lookup ###
+
+    def get(self, word, default=None):
+        phone = self._overlay.get(word)
+        if phone is not None:
+            return phone
+        return self.base.get(word, default)
+
+    def __getitem__(self, word):
+        phone = self.get(word)
+        if phone is None:
+            raise KeyError(word)
+        return phone
+
+    def __contains__(self, word):
+        return word in self._overlay or word in self.base
+
+    def __iter__(self):
+        overlay = self._overlay
+        yield from overlay
+        for word in self.base:
+            if word not in overlay:
+                yield word
+
+    def __len__(self):
+        overlay = self._overlay
+        return len(self.base) + sum(word not in self.base for word in overlay)
+
+    def renderer(self, transcription):
+        """Lexicon.renderer() of the base, user words have no pre-rendered phone ('')"""
+        renderer = getattr(self.base, 'renderer', None)
+        render = None if renderer is None else renderer(transcription)
+        if render is None:
+            return None
+        def layered(word):
+            phone = self._overlay.get(word)
+            if phone is not None:
+                return phone, ''
+            return render(word)
+        return layered
+
+    ### update ###
+
+    def set_layer(self, name, entries, strict=True):
+        """add or replace a user dictionary
+
+        Parameters
+        ----------
+        name : str
+            name of the layer, the same name replaces the layer
+        entries : dict
+            {Thai word: encoded phone}
+        strict : bool
+            if True, raise ValueError when there are invalid phones
+            if False, invalid entries are skipped
+
+        Return
+        ------
+        dict
+            {Thai word: phone} of invalid entries (skipped)
+        """
+        entries, invalid = check_entries(entries)
+        if invalid and strict:
+            raise ValueError(f'{len(invalid)} invalid phones, e.g. {next(iter(invalid.items()))}')
+        with self._lock:
+            layers = dict(self.layers)
+            layers[name] = entries
+            self._update(layers)
+        return invalid
+
+    def remove_layer(self, name):
+        with self._lock:
+            layers = dict(self.layers)
+            layers.pop(name, None)
+            self._update(layers)
+
+    def set_base(self, base):
+        """replace the base lexicon, user layers are kept"""
+        with self._lock:
+            self.base = base
+            for listener in self._listeners:
+                listener(None, None) # everything may have changed
+
+    def _update(self, layers):
+        # merge layers, then swap dict at once and tell only the difference
+        old = self._overlay
+        new = {}
+        for entries in layers.values():
+            new.update(entries)
+        changed = {word for word, phone in new.items() if old.get(word) != phone}
+        removed = {word for word in old if word not in new}
+        self.layers = layers
+        self._overlay = new
+        if changed or removed:
+            removed = {word for word in removed if word not in self.base} # still in base
+            for listener in self._listeners:
+                listener(changed, removed)
+
+    def subscribe(self, listener):
+        """listener(changed words, removed words) is called after each update
+        both are None when the base is replaced
+        """
+        self._listeners.append(listener)
+
+
+def check_entries(entries):
+    # -> (valid entries, invalid entries)
+    valid, invalid = {}, {}
+    for word, phone in entries.items():
+        phone = ' '.join(phone.split())
+        if word and phone and validate(phone):
+            valid[word] = phone
+        else:
+            invalid[word] = phone
+    return valid, invalid
+
+def read_user_dict(path):
+    """read csv of Thai word,phone (same as thai2phone.csv), lines starting with # are comments"""
+    entries = {}
+    with open(path, encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if len(row) < 2 or not row[0] or row[0].startswith('#'):
+                continue
+            entries[row[0].strip()] = row[1]
+    return entries
+
+
+class UserDictWatcher:
+    """reload user dictionary file in a background thread when it is modified
+
+    the file is checked every `interval` seconds by its modification time and size.
+    reading and validating are done in this thread; g2p is only blocked while
+    the merged dict is swapped. if the file is broken, the previous entries are kept
+    and the error is kept in `last_error`
+    """
+
+    def __init__(self, lexicon, path, name=None, interval=1.0, strict=False):
+        self.lexicon = lexicon
+        self.path = path
+        self.name = name or os.path.abspath(path)
+        self.interval = interval
+        self.strict = strict
+        self.last_error = None
+        self.invalid = {}
+        self.reloads = 0
+        self._signature = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check(self):
+        """reload now if the file is modified, returns whether it was reloaded"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            signature = None
+        else:
+            signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return False
+        try:
+            entries = read_user_dict(self.path) if signature is not None else {}
+            self.invalid = self.lexicon.set_layer(self.name, entries, strict=self.strict)
+        except (OSError, ValueError, csv.Error) as e:
+            self.last_error = e
+            return False
+        self._signature = signature
+        self.last_error = None
+        self.reloads += 1
+        return True
+
+    def start(self):
+        self.check() # first load in the calling thread, errors are raised
+        if self.last_error is not None:
+            raise self.last_error
+        self._thread = threading.Thread(target=self._run, name='thaig2p-user-dict', daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def stop(self, remove=False):
+        """stop watching, entries are kept unless remove=True"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if remove:
+            self.lexicon.remove_layer(self.name)
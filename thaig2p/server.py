@@ -0,0 +1,295 @@
+import sys, json, asyncio, argparse, multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from thaig2p.main import g2p, decode, warmup, Token
+
+##################################################
+### HTTP SERVER
+##################################################
+
+# python -m thaig2p.server --port 8000 --workers 4
+#
+# POST /g2p     {"text": "ไปโรงเรียน", "transcription": "ipa", "return_tokens": false, "decoded": true}
+#               -> {"result": "paj roːŋrian"}
+#               "return_tokens": "records" -> {"result": [{"token": "ไป", "phone": "paj1", "decoded": "paj", ...}, ...]}
+# POST /decode  {"phone": "paj1 rON1 rJn1", "transcription": "haas"}
+#               -> {"result": "payrooŋrian"}
+# GET  /health  -> {"status": "ok", ...}
+#
+# concurrent requests are collected into micro-batches (up to max_batch_size requests,
+# or max_latency seconds) and each batch runs in a worker pool, so the event loop
+# is never blocked by tokenization or tltk.
+# when more than max_queue requests are waiting, new requests get 503 (backpressure)
+# if a worker process dies (e.g. out of memory), its batch fails with 500 and the pool is recreated
+
+# API name -> (function, {json key: argument name})
+FUNCTIONS = {
+    'g2p': (g2p, {'text':'sentence', 'transcription':'transcription', 'return_tokens':'return_tokens',
+        'decoded':'decoded', 'tokenizer':'tokenizer'}),
+    'decode': (decode, {'phone':'phone', 'transcription':'transcription', 'keep_space':'keep_space'}),
+}
+REQUIRED = {'g2p':'text', 'decode':'phone'}
+MAX_BODY_SIZE = 1024 * 1024
+
+def run_batch(requests):
+    """run list of (API name, kwargs) in a worker, returns list of (ok, result or error message)"""
+    results = []
+    for name, kwargs in requests:
+        try:
+            results.append((True, _jsonable(FUNCTIONS[name][0](**kwargs))))
+        except Exception as e: # error of one request does not affect the others
+            results.append((False, f'{type(e).__name__}: {e}'))
+    return results
+
+def _jsonable(result):
+    # Token of return_tokens='records' -> dict of its attributes
+    if type(result) == list and result and isinstance(result[0], Token):
+        return [{slot:getattr(token, slot) for slot in Token.__slots__} for token in result]
+    return result
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message=None):
+        super().__init__(message or status.phrase)
+        self.status = status
+
+
+class G2PServer:
+    """asyncio HTTP server of g2p and decode with micro-batching
+
+    Parameters
+    ----------
+    host, port :
+        address to listen, localhost by default
+    workers : int
+        number of worker processes (or threads), also max number of batches running at once
+    max_batch_size : int
+        max number of requests in one batch
+    max_latency : float
+        max seconds to wait for more requests before a batch starts
+    max_queue : int
+        max number of waiting requests, more requests are rejected with 503
+    threads : bool
+        use threads instead of processes
+    """
+
+    def __init__(self, host='127.0.0.1', port=8000, workers=1, max_batch_size=64, max_latency=0.005,
+            max_queue=1024, threads=False):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.max_queue = max_queue
+        self.threads = threads
+        self.stats = {'requests':0, 'rejected':0, 'batches':0, 'errors':0, 'restarts':0}
+        self._queue = None
+        self._executor = None
+        self._server = None
+        self._batcher = None
+
+    async def start(self):
+        self._executor = self._create_executor()
+        # start workers before listening, so forked workers do not inherit client sockets
+        await asyncio.get_running_loop().run_in_executor(self._executor, warmup)
+        self._queue = asyncio.Queue(self.max_queue)
+        self._slots = asyncio.Semaphore(self.workers)
+        self._batcher = asyncio.create_task(self._collect_batches())
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1] # when port=0
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def _create_executor(self, mp_context=None):
+        if self.threads:
+            return ThreadPoolExecutor(self.workers, initializer=warmup)
+        return ProcessPoolExecutor(self.workers, mp_context=mp_context, initializer=warmup)
+
+    def _restart_executor(self, broken):
+        # replace a broken process pool once, even if several batches failed with it
+        if self._executor is not broken:
+            return
+        # already listening: spawn, so that new workers do not inherit client sockets by fork
+        self._executor = self._create_executor(multiprocessing.get_context('spawn'))
+        broken.shutdown(wait=False, cancel_futures=True)
+        self.stats['restarts'] += 1
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+        self._batcher.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    ### batching ###
+
+    async def submit(self, name, kwargs):
+        """put one request into the queue and wait for its result"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((name, kwargs, future))
+        except asyncio.QueueFull:
+            self.stats['rejected'] += 1
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, 'too many requests in queue')
+        self.stats['requests'] += 1
+        return await future
+
+    async def _collect_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_latency
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._slots.acquire() # wait for a free worker, the queue fills up meanwhile
+            asyncio.create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        try:
+            results = await loop.run_in_executor(executor, run_batch, [(name, kwargs) for name, kwargs, _ in batch])
+        except BrokenProcessPool as e: # worker process died, the pool cannot be used any more
+            self._restart_executor(executor)
+            results = [(False, f'{type(e).__name__}: {e}')] * len(batch)
+        except Exception as e:
+            results = [(False, f'{type(e).__name__}: {e}')] * len(batch)
+        finally:
+            self._slots.release()
+        self.stats['batches'] += 1
+        for (_, _, future), result in zip(batch, results):
+            if not future.done(): # client may be gone
+                future.set_result(result)
+
+    ### HTTP ###
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await self._readline(reader)
+                if not request_line:
+                    break
+                method, path, keep_alive, body = await self._read_request(request_line, reader)
+                status, response = await self._dispatch(method, path, body)
+                self._write_response(writer, status, response, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except HTTPError as e: # malformed request, connection is closed
+            self._write_response(writer, e.status, {'error':str(e)}, False)
+        except Exception as e: # e.g. result which is not JSON serializable, answer instead of dropping
+            self.stats['errors'] += 1
+            self._write_response(writer, HTTPStatus.INTERNAL_SERVER_ERROR, {'error':f'{type(e).__name__}: {e}'}, False)
+        finally:
+            writer.close()
+
+    async def _read_request(self, request_line, reader):
+        try:
+            method, path, version = request_line.decode('latin-1').split()
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST)
+        headers = {}
+        while True:
+            line = await self._readline(reader)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length', 0) or 0)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'invalid Content-Length')
+        if length < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'invalid Content-Length')
+        if length > MAX_BODY_SIZE:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        body = await reader.readexactly(length) if length else b''
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+        return method, path.split('?')[0], keep_alive, body
+
+    async def _readline(self, reader):
+        try:
+            return await reader.readline()
+        except ValueError: # longer than the limit of StreamReader (64 KiB)
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+
+    async def _dispatch(self, method, path, body):
+        try:
+            if path == '/health':
+                return HTTPStatus.OK, {'status':'ok', 'queue':self._queue.qsize(), **self.stats}
+            name = path.strip('/')
+            if name not in FUNCTIONS:
+                raise HTTPError(HTTPStatus.NOT_FOUND)
+            if method != 'POST':
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+            ok, result = await self.submit(name, self._parse_arguments(name, body))
+            if not ok:
+                self.stats['errors'] += 1
+                return HTTPStatus.INTERNAL_SERVER_ERROR, {'error':result}
+            return HTTPStatus.OK, {'result':result}
+        except HTTPError as e:
+            return e.status, {'error':str(e)}
+
+    def _parse_arguments(self, name, body):
+        try:
+            params = json.loads(body or b'{}')
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'invalid JSON')
+        if not isinstance(params, dict) or REQUIRED[name] not in params:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f'"{REQUIRED[name]}" is required')
+        names = FUNCTIONS[name][1]
+        unknown = set(params) - set(names)
+        if unknown:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f'unknown parameters: {", ".join(sorted(unknown))}')
+        return {names[key]:value for key, value in params.items()}
+
+    def _write_response(self, writer, status, response, keep_alive):
+        body = json.dumps(response, ensure_ascii=False).encode('utf-8')
+        headers = [
+            f'HTTP/1.1 {status.value} {status.phrase}',
+            'Content-Type: application/json; charset=utf-8',
+            f'Content-Length: {len(body)}',
+            f'Connection: {"keep-alive" if keep_alive else "close"}',
+        ]
+        if status == HTTPStatus.SERVICE_UNAVAILABLE:
+            headers.append('Retry-After: 1')
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + body)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m thaig2p.server', description='HTTP server of thaig2p')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('-w', '--workers', type=int, default=1, help='number of worker processes')
+    parser.add_argument('--threads', action='store_true', help='use threads instead of processes')
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-latency', type=float, default=5, help='max wait for a batch to fill, in milliseconds')
+    parser.add_argument('--max-queue', type=int, default=1024, help='max waiting requests before 503')
+    args = parser.parse_args(argv)
+    server = G2PServer(args.host, args.port, args.workers, args.max_batch_size, args.max_latency / 1000,
+        args.max_queue, args.threads)
+    async def run():
+        await server.start()
+        print(f'thaig2p server on http://{server.host}:{server.port}', file=sys.stderr, flush=True)
+        await server.serve_forever()
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+import bisect
+from thaig2p import main
+from thaig2p.normalize import clean
+
+##################################################
+### INCREMENTAL G2P
+##################################################
+
+# g2p of a text which is edited little by little (e.g. editor, live captions)
+#
+#   session = G2PSession()
+#   session.update('ไปโรงเรียน')        -> [['ไป', 'pay'], ['โรงเรียน', 'rooŋrian']]
+#   session.update('ไปโรงเรียนพรุ่งนี้')  -> only 'โรงเรียนพรุ่งนี้' is converted again
+#
+# the text is cleaned, then compared with the previous one. only the changed part,
+# widened to whole space-delimited runs, is tokenized and converted again.
+# - tokens never cross spaces (both tokenizers), so runs can be converted separately
+# - one more run on the left is included, and the window is widened while it starts
+#   with ๆ or น., because these tokens are merged into the previous token by g2p
+# - the run after the window is included if it starts with ๆ or น., for the same reason
+
+
+class G2PSession:
+    """keeps g2p(text, return_tokens=True) of the last text with offsets of tokens
+
+    Parameters
+    ----------
+    transcription, decoded, tokenizer :
+        same as g2p()
+
+    Attributes
+    ----------
+    text : str
+        cleaned text of the last update(), offsets are positions in it
+    tokens : list of [token, phone, start, end]
+        token is text[start:end] (merged tokens e.g. 'เด็ก ๆ' are joined by a space)
+
+    Example
+    -------
+        session = G2PSession()
+        session.update('ไปโรงเรียน')
+            [['ไป', 'pay'], ['โรงเรียน', 'rooŋrian']]
+        session.update('เด็ก ๆ ไปโรงเรียน')
+            [['เด็ก ๆ', 'dèkdèk'], ['ไป', 'pay'], ['โรงเรียน', 'rooŋrian']]
+        session.tokens[0]
+            ['เด็ก ๆ', 'dèkdèk', 0, 6]
+    """
+
+    def __init__(self, transcription='haas', decoded=True, tokenizer='pythainlp'):
+        self.transcription = transcription
+        self.decoded = decoded
+        self.tokenizer = tokenizer
+        self.text = ''
+        self.tokens = []
+        self.converted = 0 # characters converted by the last update(), for monitoring
+
+    def update(self, text):
+        """convert the new whole text, reusing tokens of the unchanged parts
+
+        Return
+        ------
+        list of [token, phone]
+            same as g2p(text, return_tokens=True)
+        """
+        new = clean(text)
+        old = self.text
+        if new != old:
+            start, end = self._window(old, new)
+            delta = len(new) - len(old)
+            window = self._convert(new, start, end + delta)
+            self.tokens = [t for t in self.tokens if t[3] <= start] + window\
+                + [[t[0], t[1], t[2] + delta, t[3] + delta] for t in self.tokens if t[2] >= end]
+            self.text = new
+            self.converted = end + delta - start
+        else:
+            self.converted = 0
+        return self.result()
+
+    def edit(self, start, end, replacement=''):
+        """replace text[start:end] of the cleaned text, e.g. edit(3, 3, 'a') inserts 'a' at 3"""
+        return self.update(self.text[:start] + replacement + self.text[end:])
+
+    def result(self, return_tokens=True):
+        """last result, same as g2p(text, return_tokens=return_tokens)"""
+        if return_tokens:
+            return [[token, phone] for token, phone, _, _ in self.tokens]
+        return ' '.join(phone for _, phone, _, _ in self.tokens)
+
+    def reset(self):
+        self.text = ''
+        self.tokens = []
+        self.converted = 0
+
+    def _window(self, old, new):
+        # changed part of old text, widened to runs, in positions of old text
+        prefix = _common_length(old, new, lambda text, n: text[:n])
+        limit = min(len(old), len(new)) - prefix
+        suffix = _common_length(old, new, lambda text, n: text[len(text)-n:], limit)
+        start, end = prefix, len(old) - suffix
+        starts = [token[2] for token in self.tokens]
+        # whole runs, + one run on the left for ๆ / น. at the beginning of the changed run
+        start = old.rfind(' ', 0, start) + 1
+        start = old.rfind(' ', 0, max(start - 1, 0)) + 1
+        end = _run_end(old, end)
+        while True:
+            changed = False
+            # the window must not start with a token which depends on the previous token
+            while start > 0 and _depends_on_previous(old, start):
+                start = old.rfind(' ', 0, start - 1) + 1
+                changed = True
+            # the next run may depend on the last token of the window
+            while end < len(old) and _depends_on_previous(old, end + 1):
+                end = _run_end(old, end + 1)
+                changed = True
+            # tokens merged across runs (e.g. '8.30 น.') must be in or out of the window as a whole
+            token = self._token_at(starts, start)
+            if token is not None:
+                start = old.rfind(' ', 0, token[2]) + 1
+                changed = True
+            token = self._token_at(starts, end)
+            if token is not None:
+                end = _run_end(old, token[3])
+                changed = True
+            if not changed:
+                return start, end
+
+    def _token_at(self, starts, position):
+        # token which contains position (not at its start or end), or None
+        i = bisect.bisect_left(starts, position) - 1
+        if i >= 0 and self.tokens[i][3] > position:
+            return self.tokens[i]
+        return None
+
+    def _convert(self, text, start, end):
+        # g2p of text[start:end] -> [token, phone, start, end]
+        window = text[start:end]
+        tokens = self._tokenize(window)
+        if not tokens:
+            return []
+        token_phones = main.g2p(tokens, self.transcription, return_tokens=True, decoded=self.decoded)
+        result = []
+        position = 0
+        for token, phone in token_phones:
+            token_start = None
+            for piece in token.split(' '): # merged tokens e.g. 'เด็ก ๆ'
+                found = window.find(piece, position)
+                if token_start is None:
+                    token_start = found
+                position = found + len(piece)
+            result.append([token, phone, start + token_start, start + position])
+        return result
+
+    def _tokenize(self, text):
+        # same tokenization as g2p() for cleaned text
+        if self.tokenizer == 'lexicon':
+            return [token for token, _ in main._tokenize_lexicon(text, main._thai2phone_dict(), main._lexicon_trie())]
+        return main.word_tokenize(text, keep_whitespace=False)
+
+
+def _common_length(a, b, part, limit=None):
+    # length of common prefix (or suffix) by binary search, slices are compared in C
+    low, high = 0, min(len(a), len(b)) if limit is None else limit
+    while low < high:
+        mid = (low + high + 1) // 2
+        if part(a, mid) == part(b, mid):
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+def _run_end(text, position):
+    # end of the space-delimited run which contains position
+    end = text.find(' ', position)
+    return len(text) if end == -1 else end
+
+def _depends_on_previous(text, position):
+    # whether the run starting at position may start with ๆ or น.
+    return text.startswith(('ๆ', 'น'), position)
@@ -0,0 +1,185 @@
+import threading
+from time import perf_counter
+
+##################################################
+### INSTRUMENTATION
+##################################################
+
+# opt-in statistics of g2p, e.g.
+#
+#   stats = G2PStats()
+#   g2p('ไปโรงเรียน 8.30น.', stats=stats)
+#   stats.as_dict()       -> {'calls': 1, 'seconds': {'clean': ..., 'tokenize': ...}, 'branches': {...}, ...}
+#   stats.to_prometheus() -> text for a /metrics endpoint
+#
+# when stats is not given, g2p only checks `record is not None` at each stage
+
+# stages of g2p, time of each stage is wall time in seconds
+# lookup = dictionary / time / number conversion of tokens, except tltk
+STAGES = ('clean', 'tokenize', 'lookup', 'tltk', 'decode')
+
+# how each token was converted
+# lexicon : found in THAI2PHONE_DICT
+# tltk    : Thai word not in dictionary, converted by tltk
+# time, number : converted by get_phone_time / get_phone_number
+# passthrough  : returned as it is e.g. English, punctuation
+# skip    : single Thai character, dropped
+# repeat  : ๆ, previous phone is repeated
+# merge   : น. after time, merged into previous token
+BRANCHES = ('lexicon', 'tltk', 'time', 'number', 'passthrough', 'skip', 'repeat', 'merge')
+
+# upper bounds (seconds) of histogram of tltk latency
+TLTK_BUCKETS = (0.0001, 0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class G2PRecord:
+    """measurements of one g2p call, created by G2PStats.start()"""
+
+    __slots__ = ('seconds', 'branches', 'tltk_seconds', '_last')
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.branches = dict.fromkeys(BRANCHES, 0)
+        self.tltk_seconds = [] # latency of each tltk call
+        self._last = perf_counter()
+
+    def lap(self, stage):
+        """add time since the last lap to `stage`, returns the time"""
+        now = perf_counter()
+        elapsed = now - self._last
+        self.seconds[stage] += elapsed
+        self._last = now
+        return elapsed
+
+    def count(self, branch):
+        self.branches[branch] += 1
+
+
+class G2PStats:
+    """accumulated statistics of g2p calls, thread-safe
+
+    Parameters
+    ----------
+    callback : callable
+        if given, called with G2PRecord after each g2p call
+        e.g. to send per-request timing to a logger
+
+    Example
+    -------
+        stats = G2PStats()
+        g2p('ไปโรงเรียน', stats=stats)
+        stats.lexicon_hit_rate
+            1.0
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.branches = dict.fromkeys(BRANCHES, 0)
+        self.tltk_calls = 0
+        self.tltk_seconds = 0.0
+        self.tltk_max_seconds = 0.0
+        self.tltk_buckets = [0] * len(TLTK_BUCKETS) # cumulative counts, le=bucket
+
+    def start(self):
+        return G2PRecord()
+
+    def add(self, record):
+        """add measurements of one g2p call"""
+        with self._lock:
+            self.calls += 1
+            for stage, seconds in record.seconds.items():
+                self.seconds[stage] += seconds
+            for branch, count in record.branches.items():
+                self.branches[branch] += count
+            for seconds in record.tltk_seconds:
+                self._add_tltk(seconds)
+        if self.callback is not None:
+            self.callback(record)
+
+    def _add_tltk(self, seconds):
+        self.tltk_calls += 1
+        self.tltk_seconds += seconds
+        self.tltk_max_seconds = max(self.tltk_max_seconds, seconds)
+        for i, bound in enumerate(TLTK_BUCKETS):
+            if seconds <= bound:
+                self.tltk_buckets[i] += 1
+
+    def merge(self, other):
+        """add all statistics of another G2PStats, e.g. from a worker process"""
+        with self._lock:
+            self.calls += other.calls
+            for stage in STAGES:
+                self.seconds[stage] += other.seconds[stage]
+            for branch in BRANCHES:
+                self.branches[branch] += other.branches[branch]
+            self.tltk_calls += other.tltk_calls
+            self.tltk_seconds += other.tltk_seconds
+            self.tltk_max_seconds = max(self.tltk_max_seconds, other.tltk_max_seconds)
+            self.tltk_buckets = [a + b for a, b in zip(self.tltk_buckets, other.tltk_buckets)]
+
+    @property
+    def lexicon_hit_rate(self):
+        """ratio of Thai words found in the dictionary, None if no Thai word yet"""
+        thai = self.branches['lexicon'] + self.branches['tltk']
+        return self.branches['lexicon'] / thai if thai else None
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'seconds': dict(self.seconds),
+                'branches': dict(self.branches),
+                'lexicon_hit_rate': self.lexicon_hit_rate,
+                'tltk': {
+                    'calls': self.tltk_calls,
+                    'seconds': self.tltk_seconds,
+                    'mean_seconds': self.tltk_seconds / self.tltk_calls if self.tltk_calls else None,
+                    'max_seconds': self.tltk_max_seconds,
+                },
+            }
+
+    def to_prometheus(self, prefix='thaig2p'):
+        """statistics in Prometheus text exposition format"""
+        with self._lock:
+            lines = [
+                f'# HELP {prefix}_calls_total number of g2p calls',
+                f'# TYPE {prefix}_calls_total counter',
+                f'{prefix}_calls_total {self.calls}',
+                f'# HELP {prefix}_stage_seconds_total wall time of each stage of g2p',
+                f'# TYPE {prefix}_stage_seconds_total counter',
+            ]
+            lines += [f'{prefix}_stage_seconds_total{{stage="{stage}"}} {seconds!r}' for stage, seconds in self.seconds.items()]
+            lines += [
+                f'# HELP {prefix}_tokens_total number of tokens by conversion branch',
+                f'# TYPE {prefix}_tokens_total counter',
+            ]
+            lines += [f'{prefix}_tokens_total{{branch="{branch}"}} {count}' for branch, count in self.branches.items()]
+            lines += [
+                f'# HELP {prefix}_tltk_seconds latency of tltk fallback',
+                f'# TYPE {prefix}_tltk_seconds histogram',
+            ]
+            lines += [f'{prefix}_tltk_seconds_bucket{{le="{bound!r}"}} {count}' for bound, count in zip(TLTK_BUCKETS, self.tltk_buckets)]
+            lines += [
+                f'{prefix}_tltk_seconds_bucket{{le="+Inf"}} {self.tltk_calls}',
+                f'{prefix}_tltk_seconds_sum {self.tltk_seconds!r}',
+                f'{prefix}_tltk_seconds_count {self.tltk_calls}',
+            ]
+        return '\n'.join(lines) + '\n'
+
+    ### pickle without lock, for worker processes ###
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['callback'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
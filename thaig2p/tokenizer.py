@@ -0,0 +1,172 @@
+import re
+
+##################################################
+### LEXICON TOKENIZER
+##################################################
+
+# tokenize directly by words in the lexicon (thai2phone.csv) instead of pythainlp
+# Thai parts are segmented by the path which has the fewest unknown characters,
+# then the fewest tokens (maximal matching on DAG)
+
+_END = '' # key of trie node which marks the end of a word
+
+# chunks of text: time / number / Thai / latin / whitespace / others
+# - is a minus sign only when it does not follow a word, e.g. 100-200, COVID-19 -> -, 200 / 19
+CHUNK_PATTERN = re.compile(r"""
+    (?P<time>[012]?[0-9][:\.][0-5][0-9](?![0-9]))
+    |(?P<number>(?:(?<![\w\.ก-๛])\-)?\d[\d\,]*(?:\.\d+)?)
+    |(?P<repeat>ๆ)
+    |(?P<thai>[ก-๛][ก-ๅ็-๛\.]*)
+    |(?P<latin>[A-Za-z]+)
+    |(?P<space>\s+)
+    |(?P<other>.)
+""", re.VERBOSE)
+
+# a word cannot start with these (vowels & tone marks written after consonant)
+NON_INITIALS = set('ะัาำิีึืฺุู็่้๊๋์ํ๎ๅ')
+# a word cannot end with these (vowels written before consonant)
+NON_FINALS = set('เแโใไ')
+
+
+class Trie:
+    """prefix tree of words
+
+    Example
+    -------
+        trie = Trie(['ไป', 'ไปรษณีย์'])
+        list(trie.prefixes('ไปรษณีย์ไทย'))
+            [2, 8]
+    """
+
+    def __init__(self, words=()):
+        self.root = {}
+        for word in words:
+            self.add(word)
+
+    def add(self, word):
+        node = self.root
+        for char in word:
+            node = node.setdefault(char, {})
+        node[_END] = True
+
+    def remove(self, word):
+        node = self.root
+        for char in word:
+            node = node.get(char)
+            if node is None:
+                return
+        node.pop(_END, None)
+
+    def __contains__(self, word):
+        node = self.root
+        for char in word:
+            node = node.get(char)
+            if node is None:
+                return False
+        return _END in node
+
+    def prefixes(self, text, start=0, end=None):
+        """end positions of all words which start at text[start]"""
+        node = self.root
+        for i in range(start, len(text) if end is None else end):
+            node = node.get(text[i])
+            if node is None:
+                return
+            if _END in node:
+                yield i + 1
+
+
+def _boundaries(text):
+    # positions where a token can start/end
+    n = len(text)
+    return [i == 0 or i == n or (text[i] not in NON_INITIALS and text[i-1] not in NON_FINALS)
+        for i in range(n + 1)]
+
+def segment(text, trie):
+    """segment Thai text by words in trie
+
+    Parameters
+    ----------
+    text : str
+        Thai text without whitespaces
+    trie : Trie
+
+    Return
+    ------
+    list of (str, bool)
+        (token, whether the token is in trie)
+    """
+    n = len(text)
+    valid = _boundaries(text)
+    # best[i] = (unknown characters, tokens, -next position, known) for text[i:]
+    # if same cost, longer token first
+    best = [None] * (n + 1)
+    best[n] = (0, 0, -n, True)
+    next_boundary = n
+    root = trie.root
+    for i in range(n - 1, -1, -1):
+        if not valid[i]:
+            continue
+        # unknown chunk until the next boundary
+        unknown, tokens, _, _ = best[next_boundary]
+        candidate = (unknown + next_boundary - i, tokens + 1, -next_boundary, False)
+        node = root
+        for end in range(i + 1, n + 1): # walk trie, same as trie.prefixes(text, i)
+            node = node.get(text[end-1])
+            if node is None:
+                break
+            if _END in node and valid[end]:
+                unknown, tokens, _, _ = best[end]
+                if (unknown, tokens + 1, -end) < candidate[:3]:
+                    candidate = (unknown, tokens + 1, -end, True)
+        best[i] = candidate
+        next_boundary = i
+    # follow the path, merge consecutive unknown chunks
+    result = []
+    i = 0
+    while i < n:
+        _, _, end, known = best[i]
+        end = -end
+        if not known and result and not result[-1][1]:
+            result[-1] = (result[-1][0] + text[i:end], False)
+        else:
+            result.append((text[i:end], known))
+        i = end
+    return result
+
+def tokenize(text, lexicon, trie, get=None):
+    """tokenize text and look up phones of Thai words at the same time
+
+    Parameters
+    ----------
+    text : str
+        cleaned text
+    lexicon : dict
+        {Thai word: phone} e.g. THAI2PHONE_DICT
+    trie : Trie
+        trie of words in lexicon
+    get : callable
+        function to look up words found in trie, lexicon.get by default
+
+    Return
+    ------
+    list of (str, str or None)
+        (token, phone), phone is None when the token is not in the lexicon
+
+    Example
+    -------
+        tokenize('ไปโรงเรียน 8.30น.', THAI2PHONE_DICT, trie)
+            [('ไป', 'paj1'), ('โรงเรียน', 'rON1 rJn1'), ('8.30', None), ('น.', 'nA-1 li-4 kA-1')]
+    """
+    get = lexicon.get if get is None else get
+    token_phone_list = []
+    for match in CHUNK_PATTERN.finditer(text):
+        kind = match.lastgroup
+        if kind == 'space':
+            continue
+        elif kind == 'thai':
+            for token, known in segment(match.group(), trie):
+                token_phone_list.append((token, get(token) if known else None))
+        else:
+            token_phone_list.append((match.group(), None))
+    return token_phone_list